@@ -1,19 +1,25 @@
-import io
-import tempfile
-import subprocess
+import threading
 from pathlib import Path
 import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
 import textwrap
 import sys
 import os
 
-# Optional duckdb import (not required)
-try:
-    import duckdb
-except Exception:
-    duckdb = None
+# Share the loading/analysis engines with the app/ package
+APP_DIR = Path(__file__).resolve().parent / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+from data_loader import DataLoader
+from cache import content_hash, dataset_fingerprint, dataset_key, schema_fingerprint
+from schema import SchemaInferer
+from sql_backend import use_duckdb as _use_duckdb, quote as _q
+import sandbox
+from precompute import Precomputer
+from batch import BatchPlanner
+from rollup import RollupCube
+from llm import LLMError, ollama, response_cache
+from prompt_builder import PromptBuilder
 
 # ----------------- Load data -----------------
 def _looks_like_csv(raw_bytes: bytes) -> bool:
@@ -23,63 +29,63 @@ def _looks_like_csv(raw_bytes: bytes) -> bool:
         return False
     return "," in sample and "\n" in sample
 
-def load_data(file_or_path) -> pd.DataFrame:
+def load_data(file_or_path, progress=None, optimize=False) -> pd.DataFrame:
     """
     Accepts Streamlit UploadedFile, path string/Path, or file-like object.
     Returns pandas DataFrame.
+    Large CSVs are parsed in chunks; `progress(fraction, chunk)` is called after each one.
+    Parsed frames are cached by content hash (in memory and as Arrow files under
+    DATA_DIR) and shared across reruns, sessions and restarts.
+    With `optimize`, column dtypes are compacted once before caching.
     """
+    if isinstance(file_or_path, (str, Path)):
+        suffix = Path(file_or_path).suffix.lower()
+    else:
+        name = getattr(file_or_path, "name", None)
+        suffix = Path(name).suffix.lower() if name else "sniff"
+    key = dataset_key(content_hash(file_or_path), {"format": suffix, "optimize": optimize})
+    return DataLoader.load_cached(key, lambda: _parse_data(file_or_path, progress),
+                                  optimize=optimize)
+
+def _parse_data(file_or_path, progress=None) -> pd.DataFrame:
     if isinstance(file_or_path, (str, Path)):
         p = Path(file_or_path)
         s = p.suffix.lower()
-        if s == ".csv":
-            return pd.read_csv(p)
         if s in {".xls", ".xlsx"}:
             return pd.read_excel(p)
         if s == ".json":
             return pd.read_json(p)
-        return pd.read_csv(p)
+        with open(p, "rb") as f:
+            return DataLoader.read_csv(f, progress=progress)
 
-    # file-like (UploadedFile)
+    # file-like (UploadedFile): parse straight from the object, no raw-bytes copy
     name = getattr(file_or_path, "name", None)
     suffix = Path(name).suffix.lower() if name else None
-    raw = file_or_path.read()
-    if isinstance(raw, str):
-        raw = raw.encode("utf-8")
-    bio = io.BytesIO(raw)
+    file_or_path.seek(0)
+    head = file_or_path.read(1024)
+    file_or_path.seek(0)
+    if isinstance(head, str):
+        head = head.encode("utf-8")
 
-    if suffix == ".csv" or (suffix is None and _looks_like_csv(raw)):
-        bio.seek(0); return pd.read_csv(bio)
+    if suffix == ".csv" or (suffix is None and _looks_like_csv(head)):
+        return DataLoader.read_csv(file_or_path, progress=progress)
     if suffix in {".xls", ".xlsx"}:
-        bio.seek(0); return pd.read_excel(bio)
+        return pd.read_excel(file_or_path)
     if suffix == ".json":
-        bio.seek(0); return pd.read_json(bio)
+        return pd.read_json(file_or_path)
     # fallback
-    bio.seek(0)
     try:
-        return pd.read_csv(bio)
+        return DataLoader.read_csv(file_or_path, progress=progress)
     except Exception:
-        bio.seek(0); return pd.read_json(bio)
+        file_or_path.seek(0); return pd.read_json(file_or_path)
 
 # ----------------- Detect column types -----------------
 def _detect_column_types(df: pd.DataFrame):
-    numeric = df.select_dtypes(include=[np.number]).columns.tolist()
-    datetime = []
-    # try to infer datetime columns
-    for c in df.columns:
-        if np.issubdtype(df[c].dtype, np.datetime64):
-            datetime.append(c)
-        else:
-            # try to parse small sample as date
-            try:
-                sample = df[c].dropna().astype(str).iloc[:20]
-                parsed = pd.to_datetime(sample, errors="coerce")
-                if parsed.notna().sum() >= max(1, min(5, len(sample)//2)):
-                    datetime.append(c)
-            except Exception:
-                pass
-    # categoricals: low cardinality non-numeric
-    categorical = [c for c in df.columns if c not in numeric + datetime and df[c].nunique(dropna=True) <= 50]
-    return {"numeric": numeric, "datetime": datetime, "categorical": categorical}
+    """
+    Sample-based type detection, cached per dataset fingerprint
+    (see SchemaInferer), so repeated calls on the same data are free.
+    """
+    return SchemaInferer.infer(df)
 
 # ----------------- Suggest prompts -----------------
 def suggest_prompts(df: pd.DataFrame, max_suggestions: int = 8):
@@ -121,121 +127,201 @@ def suggest_prompts(df: pd.DataFrame, max_suggestions: int = 8):
     
     return suggestions[:max_suggestions]
 
+# ----------------- SQL templates -----------------
+def _sql_code(sql: str, columns=None, parse_dates=(), post: str = "") -> str:
+    args = ""
+    if columns is not None:
+        args += f", columns={list(columns)!r}"
+    if parse_dates:
+        args += f", parse_dates={list(parse_dates)!r}"
+    return f"result = run_sql(df, {sql!r}{args})\n" + post
+
+def _sql_top_counts(col) -> str:
+    # Ties keep first-appearance order, like value_counts
+    return textwrap.dedent(f"""
+        SELECT {_q(col)}, count(*) AS "count"
+        FROM (SELECT {_q(col)}, row_number() OVER () AS __row FROM df)
+        GROUP BY {_q(col)}
+        ORDER BY "count" DESC, min(__row)
+        LIMIT 10
+    """)
+
+def _sql_top_rows(col) -> str:
+    return textwrap.dedent(f"""
+        SELECT * EXCLUDE (__row)
+        FROM (SELECT *, row_number() OVER () AS __row FROM df)
+        ORDER BY {_q(col)} DESC NULLS LAST, __row
+        LIMIT 10
+    """)
+
+def _sql_monthly(dcol, value_sql: str, value_name) -> str:
+    # Every month between the first and last date, empty months included (like resample)
+    return textwrap.dedent(f"""
+        WITH src AS (SELECT * FROM df WHERE {_q(dcol)} IS NOT NULL),
+        months AS (
+            SELECT unnest(generate_series(date_trunc('month', min({_q(dcol)})),
+                                          date_trunc('month', max({_q(dcol)})),
+                                          INTERVAL 1 MONTH)) AS m
+            FROM src
+        ),
+        agg AS (
+            SELECT date_trunc('month', {_q(dcol)}) AS m, {value_sql} AS v
+            FROM src GROUP BY 1
+        )
+        SELECT CAST(last_day(months.m) AS TIMESTAMP) AS {_q(dcol)},
+               coalesce(agg.v, 0) AS {_q(value_name)}
+        FROM months LEFT JOIN agg USING (m)
+        ORDER BY months.m
+    """)
+
 # ----------------- Convert prompt to code -----------------
-def prompt_to_code(prompt: str, df: pd.DataFrame):
+def match_template(prompt: str):
     """
-    Convert known prompt templates into runnable python code strings.
+    Recognize a built-in prompt template.
+    Returns (template name, args) or None.
     """
+    import re
     p = prompt.strip().lower()
 
     # Summary
     if p.startswith("summarize the dataset"):
-        code = textwrap.dedent("""
-            info = []
-            info.append(f"Rows: {len(df)}, Columns: {len(df.columns)}")
-            info.append("Column types: " + ", ".join([f"{c}:{str(df[c].dtype)[:10]}" for c in df.columns[:10]]))
-            miss = df.isnull().sum().sort_values(ascending=False).head(10)
-            info.append("Top missing: " + ", ".join([f"{idx}:{val}" for idx,val in miss.items() if val>0]))
-            numeric = df.select_dtypes(include=['number']).columns.tolist()
-            info.append(f"Numeric columns count: {len(numeric)}")
-            result = "\\n".join(["- "+i for i in info])
-        """)
-        return code
+        return "summarize", ()
 
     # Top counts for categorical
     if "top 10 counts for the categorical column" in p or "top 10 counts" in p and "'" in p:
-        import re
         m = re.search(r"'([^']+)'", prompt)
         if not m:
             m = re.search(r'"([^"]+)"', prompt)
-        col = m.group(1) if m else None
-        if col:
-            code = textwrap.dedent(f"""
-                result = df['{col}'].value_counts(dropna=False).head(10).reset_index()
-                result.columns = ['value','count']
-            """)
-            return code
+        if m:
+            return "top_counts", (m.group(1),)
 
     # Summary statistics
     if "summary statistics" in p or "describe" in p:
-        code = textwrap.dedent("""
-            result = df.select_dtypes(include=['number']).describe().T
-        """)
-        return code
+        return "describe", ()
 
     # Histogram
     if p.startswith("create a histogram of the numeric column") or "histogram of the numeric column" in p:
-        import re
         m = re.search(r"'([^']+)'", prompt)
-        col = m.group(1) if m else None
-        if col:
-            code = textwrap.dedent(f"""
-                plt.figure(figsize=(6,4))
-                df['{col}'].dropna().astype(float).hist(bins=30)
-                plt.title('Histogram of {col}')
-                plt.xlabel('{col}')
-                plt.ylabel('count')
-                result_img_path = None
-            """)
-            return code
+        if m:
+            return "histogram", (m.group(1),)
 
     # Scatter plot
     if "scatter plot comparing" in p and "vs" in p:
-        import re
-        m = re.search(r"'([^']+)' \\(x\\) vs '([^']+)' \\(y\\)", prompt)
+        m = re.search(r"'([^']+)' \(x\) vs '([^']+)' \(y\)", prompt)
         if m:
-            xcol, ycol = m.group(1), m.group(2)
-            code = textwrap.dedent(f"""
-                plt.figure(figsize=(6,4))
-                df.plot.scatter(x='{xcol}', y='{ycol}')
-                plt.title('{ycol} vs {xcol}')
-                result_img_path = None
-            """)
-            return code
+            return "scatter", (m.group(1), m.group(2))
 
     # Top rows sorted
     if p.startswith("show the top 10 rows sorted by"):
-        import re
         m = re.search(r"by '([^']+)'", prompt)
         if m:
-            col = m.group(1)
-            code = textwrap.dedent(f"""
-                result = df.sort_values('{col}', ascending=False).head(10).reset_index(drop=True)
-            """)
-            return code
+            return "top_rows", (m.group(1),)
 
     # Time series monthly sum
     if "monthly sum" in p and "using the datetime column" in p:
-        import re
         m = re.search(r"sum of '([^']+)' using the datetime column '([^']+)'", prompt)
         if m:
-            ag, dcol = m.group(1), m.group(2)
-            code = textwrap.dedent(f"""
-                tmp = df.copy()
-                tmp['{dcol}'] = pd.to_datetime(tmp['{dcol}'], errors='coerce')
-                res = tmp.dropna(subset=['{dcol}'])
-                res = res.set_index('{dcol}').resample('M')['{ag}'].sum().reset_index()
-                result = res
-            """)
-            return code
+            return "monthly_sum", (m.group(1), m.group(2))
 
     # Counts per month
     if "counts per month using the datetime column" in p:
-        import re
         m = re.search(r"datetime column '([^']+)'", prompt)
-        dcol = m.group(1) if m else None
-        if dcol:
-            code = textwrap.dedent(f"""
-                tmp = df.copy()
-                tmp['{dcol}'] = pd.to_datetime(tmp['{dcol}'], errors='coerce')
-                res = tmp.dropna(subset=['{dcol}']).set_index('{dcol}').resample('M').size().reset_index(name='count')
-                result = res
-            """)
-            return code
+        if m:
+            return "monthly_count", (m.group(1),)
 
     # Correlation heatmap
     if "correlation matrix heatmap" in p or "correlation heatmap" in p:
-        code = textwrap.dedent("""
+        return "correlation", ()
+
+    # Anomaly detection
+    if "anomalies" in p and "z-score" in p:
+        return "anomalies", ()
+
+    return None
+
+def prompt_to_code(prompt: str, df: pd.DataFrame):
+    """
+    Convert known prompt templates into runnable python code strings.
+    """
+    template = match_template(prompt)
+    if template is None:
+        return None
+    name, args = template
+
+    if name == "summarize":
+        return textwrap.dedent("""
+            info = []
+            info.append(f"Rows: {len(df)}, Columns: {len(df.columns)}")
+            info.append("Column types: " + ", ".join([f"{c}:{str(df[c].dtype)[:10]}" for c in df.columns[:10]]))
+            miss = df.isnull().sum().sort_values(ascending=False).head(10)
+            info.append("Top missing: " + ", ".join([f"{idx}:{val}" for idx,val in miss.items() if val>0]))
+            numeric = df.select_dtypes(include=['number']).columns.tolist()
+            info.append(f"Numeric columns count: {len(numeric)}")
+            result = "\\n".join(["- "+i for i in info])
+        """)
+
+    if name == "top_counts":
+        col, = args
+        if _use_duckdb():
+            return _sql_code(_sql_top_counts(col), columns=[col],
+                             post="result.columns = ['value','count']\n")
+        return textwrap.dedent(f"""
+            result = top_counts(df, '{col}', 10)
+        """)
+
+    if name == "describe":
+        return textwrap.dedent("""
+            result = df.select_dtypes(include=['number']).describe().T
+        """)
+
+    if name == "histogram":
+        col, = args
+        return textwrap.dedent(f"""
+            plt.figure(figsize=(6,4))
+            plot_histogram(df, '{col}', bins=30)
+            plt.title('Histogram of {col}')
+            plt.xlabel('{col}')
+            plt.ylabel('count')
+            result_img_path = None
+        """)
+
+    if name == "scatter":
+        xcol, ycol = args
+        return textwrap.dedent(f"""
+            plt.figure(figsize=(6,4))
+            plot_scatter(df, '{xcol}', '{ycol}')
+            plt.title('{ycol} vs {xcol}')
+            result_img_path = None
+        """)
+
+    if name == "top_rows":
+        col, = args
+        if _use_duckdb():
+            return _sql_code(_sql_top_rows(col))
+        return textwrap.dedent(f"""
+            result = df.sort_values('{col}', ascending=False, kind='stable').head(10).reset_index(drop=True)
+        """)
+
+    if name == "monthly_sum":
+        ag, dcol = args
+        if _use_duckdb():
+            return _sql_code(_sql_monthly(dcol, f"sum({_q(ag)})", ag),
+                             columns=[dcol, ag], parse_dates=[dcol])
+        return textwrap.dedent(f"""
+            result = rollup(df, '{dcol}', 'month', '{ag}')
+        """)
+
+    if name == "monthly_count":
+        dcol, = args
+        if _use_duckdb():
+            return _sql_code(_sql_monthly(dcol, "count(*)", "count"),
+                             columns=[dcol], parse_dates=[dcol])
+        return textwrap.dedent(f"""
+            result = rollup(df, '{dcol}', 'month')
+        """)
+
+    if name == "correlation":
+        return textwrap.dedent("""
             corr = df.select_dtypes(include=['number']).corr()
             import matplotlib.pyplot as plt
             plt.figure(figsize=(6,5))
@@ -246,11 +332,9 @@ def prompt_to_code(prompt: str, df: pd.DataFrame):
             plt.title('Correlation matrix')
             result_img_path = None
         """)
-        return code
 
-    # Anomaly detection
-    if "anomalies" in p and "z-score" in p:
-        code = textwrap.dedent("""
+    if name == "anomalies":
+        return textwrap.dedent("""
             from scipy import stats
             num = df.select_dtypes(include=['number']).dropna()
             if num.shape[1]==0:
@@ -260,64 +344,157 @@ def prompt_to_code(prompt: str, df: pd.DataFrame):
                 mask = (z > 3).any(axis=1)
                 result = df.loc[mask].head(20).reset_index(drop=True)
         """)
-        return code
 
     return None
 
 # ----------------- Execute code -----------------
-def run_code(df: pd.DataFrame, code: str):
+def run_code(df: pd.DataFrame, code: str, timeout: float = None, cancel=None):
     """
-    Execute code string and return results.
+    Execute code string in a sandbox worker and return results.
+    Results also carry "status" (ok / error / timeout / cancelled / crashed),
+    captured "stdout" and "elapsed" seconds; charts are PNG bytes under "png".
     """
-    local_ns = {"pd": pd, "np": np, "df": df, "plt": plt}
-    old_stdout = sys.stdout
-    stdout_buf = io.StringIO()
-    sys.stdout = stdout_buf
-    
-    try:
-        exec(code, {}, local_ns)
-        
-        if "result_img_path" in local_ns and local_ns["result_img_path"]:
-            path = local_ns["result_img_path"]
-            return {"type": "image", "path": path}
-        
-        figs = plt.get_fignums()
-        if figs:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as f:
-                plt.savefig(f.name, bbox_inches="tight", dpi=150)
-                plt.close("all")
-                return {"type": "image", "path": f.name}
-        
-        if "result" in local_ns:
-            res = local_ns["result"]
-            if isinstance(res, pd.DataFrame):
-                return {"type": "dataframe", "df": res}
-            else:
-                return {"type": "text", "output": str(res)}
-        
-        out = stdout_buf.getvalue().strip()
-        if out:
-            return {"type": "text", "output": out}
-        return {"type": "text", "output": "Execution finished. No result produced."}
-    except Exception as e:
-        return {"type": "text", "output": f"Execution error: {e}"}
-    finally:
-        sys.stdout = old_stdout
+    return sandbox.run(df, code, timeout=timeout, cancel=cancel)
+
+# ----------------- Precompute suggestions -----------------
+# Relative cost of each template, cheapest first (matched on the prompt text)
+TEMPLATE_COSTS = [
+    ("summarize the dataset", 1),
+    ("top 10 counts", 2),
+    ("summary statistics", 3),
+    ("histogram", 3),
+    ("top 10 rows sorted by", 4),
+    ("counts per month", 5),
+    ("monthly sum", 5),
+    ("scatter plot", 6),
+    ("correlation", 8),
+    ("anomalies", 8),
+]
+
+def prompt_cost(prompt: str) -> float:
+    """
+    Rough relative cost of a prompt; unknown prompts go last.
+    """
+    p = prompt.lower()
+    for pattern, cost in TEMPLATE_COSTS:
+        if pattern in p:
+            return cost
+    return 100
+
+def run_prompt(df: pd.DataFrame, prompt: str, cancel=None):
+    """
+    Run a built-in prompt; None if it isn't one.
+    """
+    code = prompt_to_code(prompt, df)
+    if code is None:
+        return None
+    return run_code(df, code, cancel=cancel)
+
+def run_batch(df: pd.DataFrame, prompts, cancel=None, on_result=None):
+    """
+    Run several built-in templates together: they share their reads of
+    the data (profile, value counts, parsed dates...) through BatchPlanner.
+    Prompts already in the sandbox result cache are taken from it; the
+    rest land there under each template's code, so running a prompt
+    afterwards is a hit. Every result goes to `on_result(prompt, result)`
+    as soon as it exists.
+    Returns {prompt: result} for the prompts answered this way; the
+    others (custom prompts, templates it can't derive) are left to the
+    caller to run on their own.
+    """
+    fingerprint = dataset_fingerprint(df)
+
+    def deliver(prompt, result):
+        sandbox.result_cache.put(sandbox.result_key(fingerprint, prompt_to_code(prompt, df)), result)
+        if on_result is not None:
+            on_result(prompt, result)
+
+    specs, cached = {}, {}
+    for p in sorted(prompts, key=prompt_cost):
+        spec = match_template(p)
+        if not spec:
+            continue
+        # Already run (e.g. claimed and run by the caller): don't derive it again
+        result = sandbox.result_cache.get(sandbox.result_key(fingerprint, prompt_to_code(p, df)))
+        if result is None:
+            specs[p] = spec
+        else:
+            cached[p] = result
+            if on_result is not None:
+                on_result(p, result)
+    return {**cached, **BatchPlanner(df).run(specs, cancel=cancel, on_result=deliver)}
+
+def start_rollups(df: pd.DataFrame):
+    """
+    Build the day/week/month/quarter rollups of every datetime column in
+    the background, so time-series prompts are answered from them.
+    """
+    types = _detect_column_types(df)
+    if types["datetime"]:
+        RollupCube.start(df, types["datetime"], types["numeric"])
+
+def make_precomputer() -> Precomputer:
+    """
+    Background runner for the suggested prompts of one session.
+    """
+    return Precomputer(run_prompt, cost=prompt_cost, batch=run_batch)
 
 # ----------------- Ask LLM (optional) -----------------
-def ask_llm(prompt: str, model: str = "llama3.1", timeout: int = 60) -> str:
+def stream_llm(prompt: str, model: str = "llama3.1", timeout: int = 60):
     """
-    Send prompt to local Ollama via CLI.
+    Stream the answer of the local Ollama server, token by token.
+    Failures are yielded as a single "[LLM-...]" message.
     """
     try:
-        proc = subprocess.run(["ollama", "run", model], input=prompt.encode("utf-8"),
-                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
-        out = proc.stdout.decode("utf-8", errors="replace")
-        err = proc.stderr.decode("utf-8", errors="replace")
-        if not out and err:
-            return f"[LLM-error] {err}"
-        return out
-    except FileNotFoundError:
-        return "[LLM-missing] ollama not found on PATH."
+        yield from ollama.stream(prompt, model, timeout=timeout)
+    except ConnectionRefusedError:
+        yield f"[LLM-missing] no Ollama server at {ollama.host}:{ollama.port}."
+    except LLMError as e:
+        yield f"[LLM-error] {e}"
     except Exception as e:
-        return f"[LLM-failed] {e}"
\ No newline at end of file
+        yield f"[LLM-failed] {e}"
+
+def ask_llm(prompt: str, model: str = "llama3.1", timeout: int = 60) -> str:
+    """
+    Send prompt to local Ollama over HTTP and return the full answer.
+    """
+    return "".join(stream_llm(prompt, model=model, timeout=timeout))
+
+def build_llm_prompt(prompt: str, df: pd.DataFrame, model: str = "llama3.1"):
+    """
+    Full LLM prompt with a schema summary sized for the model.
+    Returns (text, report) where report has "tokens", "budget" and column counts.
+    """
+    return PromptBuilder.build(df, prompt, model)
+
+def extract_code(llm_out: str):
+    """
+    The first ```python block of an LLM answer, or None.
+    """
+    if "```python" not in llm_out:
+        return None
+    return llm_out.split("```python")[1].split("```")[0]
+
+def cached_llm_code(prompt: str, df: pd.DataFrame, model: str):
+    """
+    Code generated earlier for the same prompt, model and column layout.
+    """
+    return response_cache.get(model, prompt, schema_fingerprint(df))
+
+def remember_llm_code(prompt: str, df: pd.DataFrame, model: str, code: str,
+                      seconds: float = 0.0) -> bool:
+    """
+    Cache generated code that ran without error; `seconds` is what generating it took.
+    """
+    return response_cache.put(model, prompt, schema_fingerprint(df), code, seconds)
+
+def warm_llm(model: str = "llama3.1") -> None:
+    """
+    Load the model in the background so the first prompt doesn't wait for it.
+    """
+    def _warm():
+        try:
+            ollama.warm(model)
+        except Exception:
+            pass
+    threading.Thread(target=_warm, daemon=True).start()
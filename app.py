@@ -1,5 +1,8 @@
 import streamlit as st
-from analyst import load_data, suggest_prompts, prompt_to_code, run_code, ask_llm
+import time
+from analyst import (load_data, suggest_prompts, prompt_to_code, run_code, stream_llm, warm_llm,
+                     build_llm_prompt, extract_code, cached_llm_code, remember_llm_code,
+                     response_cache, make_precomputer, start_rollups)
 import pandas as pd
 
 st.set_page_config(page_title="Personal AI Data Analyst", layout="wide")
@@ -9,6 +12,15 @@ st.sidebar.header("Settings")
 use_llm = st.sidebar.checkbox("Use local LLM (ollama) for custom prompts", value=False)
 llm_model = st.sidebar.text_input("LLM model name (ollama)", value="llama3.1")
 st.sidebar.markdown("If you don't have `ollama` installed, leave this off and use built-in prompts.")
+if use_llm and st.session_state.get("warmed_model") != llm_model:
+    # Load the model while the user picks a prompt
+    warm_llm(llm_model)
+    st.session_state["warmed_model"] = llm_model
+if use_llm:
+    cache_stats = response_cache.stats()
+    st.sidebar.caption(f"LLM code cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                       f"since start, {cache_stats['entries']} stored, "
+                       f"~{cache_stats['saved_seconds']:.0f}s of generation saved")
 
 uploaded = st.file_uploader("Upload CSV, Excel, or JSON", type=["csv","xls","xlsx","json"])
 if uploaded is None:
@@ -17,7 +29,20 @@ if uploaded is None:
 
 # Load data
 try:
-    df = load_data(uploaded)
+    with st.spinner("Loading data..."):
+        progress_bar = st.empty()
+        preview_area = st.empty()
+        preview_shown = []
+
+        def show_progress(done, chunk):
+            progress_bar.progress(done, text=f"Parsing... {done:.0%}")
+            if not preview_shown:
+                preview_area.dataframe(chunk.head(100))
+                preview_shown.append(True)
+
+        df = load_data(uploaded, progress=show_progress)
+        progress_bar.empty()
+        preview_area.empty()
 except Exception as e:
     st.error(f"Failed to load file: {e}")
     st.stop()
@@ -28,6 +53,14 @@ with st.expander("Preview data (first 100 rows)"):
 
 # Generate suggestions
 suggestions = suggest_prompts(df)
+
+# Compute every suggestion in the background, cheapest first; switching
+# to another dataset cancels whatever is left for the previous one
+if "precomputer" not in st.session_state:
+    st.session_state["precomputer"] = make_precomputer()
+precomputer = st.session_state["precomputer"]
+start_rollups(df)  # first, so the monthly suggestions read the rollups
+precomputer.start(df, suggestions)
 st.markdown("## Suggested analyses (pick one or write your own)")
 col1, col2 = st.columns([3,1])
 with col1:
@@ -35,6 +68,8 @@ with col1:
     custom = st.text_area("Or write a custom prompt (leave blank to use the selected suggestion)", height=80)
 with col2:
     st.markdown("**Quick actions**")
+    progress = precomputer.status()
+    st.caption(f"Precomputed {progress['done']} of {progress['done'] + progress['pending']} suggestions")
     if st.button("Show suggestions again"):
         st.write(suggestions)
 
@@ -44,44 +79,60 @@ final_prompt = custom.strip() if custom and custom.strip() else selected
 st.markdown("### Final prompt")
 st.write(final_prompt)
 
+# Ask the LLM again instead of reusing code cached for this prompt
+regenerate = use_llm and st.checkbox("Regenerate LLM code (skip the cache)", value=False)
+
 # Run button
 if st.button("Run analysis"):
     with st.spinner("Running..."):
-        code = prompt_to_code(final_prompt, df)
-        if code:
+        # Already computed (or being computed) in the background?
+        res = precomputer.claim(df, final_prompt)
+        code = prompt_to_code(final_prompt, df) if res is None else None
+        if res is None and code:
             res = run_code(df, code)
-        else:
+        elif res is None:
             if use_llm:
-                system = (
-                    "You are a helpful data analyst and will respond with Python code only.\n"
-                    "You must return code inside a ```python ... ``` block. The DataFrame is named `df`.\n"
-                    "Use pandas for data manipulation and matplotlib for charts. Do not import heavy libs.\n"
-                    "If returning a chart, produce matplotlib code that draws the figure (no show()) and nothing else.\n"
-                )
-                raw = system + "\n# User prompt: " + final_prompt
-                llm_out = ask_llm(raw, model=llm_model)
-                if llm_out.startswith("[LLM-missing]") or llm_out.startswith("[LLM-"):
-                    st.warning("LLM unavailable or returned an error.")
-                    st.write(llm_out)
-                    st.stop()
-                if "```python" in llm_out:
-                    try:
-                        code = llm_out.split("```python")[1].split("```")[0]
-                        res = run_code(df, code)
-                    except Exception as e:
-                        st.error(f"Failed to execute code from LLM: {e}")
+                code = None if regenerate else cached_llm_code(final_prompt, df, llm_model)
+                generated = None
+                if code:
+                    st.caption("♻️ Reusing code generated earlier for this prompt and column layout")
+                    with st.expander("Generated code"):
+                        st.code(code, language="python")
+                else:
+                    raw, prompt_report = build_llm_prompt(final_prompt, df, model=llm_model)
+                    shown = prompt_report["detailed"] + prompt_report["listed"]
+                    st.caption(f"Prompt: ~{prompt_report['tokens']} tokens of {prompt_report['budget']}, "
+                               f"{shown} of {shown + prompt_report['omitted']} columns described")
+                    started = time.perf_counter()
+                    with st.expander("LLM response", expanded=True):
+                        llm_out = st.write_stream(stream_llm(raw, model=llm_model))
+                    if llm_out.startswith("[LLM-missing]") or llm_out.startswith("[LLM-"):
+                        st.warning("LLM unavailable or returned an error.")
                         st.write(llm_out)
                         st.stop()
-                else:
-                    st.error("LLM did not return a python code block.")
-                    st.write(llm_out)
+                    code = extract_code(llm_out)
+                    if code is None:
+                        st.error("LLM did not return a python code block.")
+                        st.write(llm_out)
+                        st.stop()
+                    generated = time.perf_counter() - started
+                try:
+                    res = run_code(df, code)
+                except Exception as e:
+                    st.error(f"Failed to execute code from LLM: {e}")
+                    st.code(code, language="python")
                     st.stop()
+                # Only code that ran cleanly is worth serving again
+                if generated is not None and res.get("status") == "ok":
+                    remember_llm_code(final_prompt, df, llm_model, code, generated)
             else:
                 st.error("This is a custom prompt. Enable 'Use local LLM' in the sidebar or use built-in prompts.")
                 st.stop()
 
     # Display result
-    if res["type"] == "text":
+    if res.get("status") in ("timeout", "cancelled", "crashed"):
+        st.error(res["output"])
+    elif res["type"] == "text":
         st.markdown("#### Output (text)")
         st.text(res["output"])
     elif res["type"] == "dataframe":
@@ -91,6 +142,14 @@ if st.button("Run analysis"):
         st.download_button("Download result as CSV", data=csv, file_name="result.csv", mime="text/csv")
     elif res["type"] == "image":
         st.markdown("#### Output (chart)")
-        st.image(res["path"], use_column_width=True)
+        st.image(res["png"], use_column_width=True)
+        st.download_button("Download chart as PNG", data=res["png"], file_name="chart.png", mime="image/png")
     else:
-        st.write("Unknown result type", res)
\ No newline at end of file
+        st.write("Unknown result type", res)
+
+    if res.get("stdout") and res["type"] != "text":
+        with st.expander("Printed output"):
+            st.text(res["stdout"])
+    if "elapsed" in res:
+        st.caption("Result served from cache" if res.get("cached")
+                   else f"Ran in {res['elapsed']:.2f}s in a sandbox worker")
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""Batch Analysis Module"""
+import io
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+import numpy as np
+from config import CHART_DPI, HISTOGRAM_BINS
+from correlation import CorrelationEngine
+from outliers import OutlierDetector
+from plotting import PlotAggregator
+from profiler import DataProfiler
+from running_stats import RunningStats
+from groups import GroupIndex
+from rollup import RollupCube
+from time_index import TimeIndex
+
+# What each template reads; everything else it derives from these
+NEEDS = {
+    "summarize": lambda args: [("nulls",)],
+    "top_counts": lambda args: [("groups", args[0])],
+    "describe": lambda args: [("moments",), ("quartiles",)],
+    "histogram": lambda args: [("histogram", args[0])],
+    "scatter": lambda args: [],
+    "top_rows": lambda args: [],
+    "monthly_sum": lambda args: [("dates", args[1])],
+    "monthly_count": lambda args: [("dates", args[0])],
+    "correlation": lambda args: [("correlation",)],
+    "anomalies": lambda args: [("nulls",), ("moments",)],
+}
+
+
+class BatchPlanner:
+    """Answers several built-in templates from one set of shared reads
+
+    Templates are given as (name, args) specs. The planner collects what
+    they read (null counts, the numeric moments, a column's group index,
+    a parsed datetime column, the correlation matrix...), computes each of
+    those once and derives every result from them, so the whole suggestion
+    list costs about one scan of the data. Reads the dataset profile
+    already answers are taken from it when it's cached. A template it
+    can't answer exactly in this way (e.g. the z-score scan with missing
+    values) is left out of the results for the caller to run on its own.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._shared: Dict[Tuple, object] = {}
+
+    @staticmethod
+    def plan(specs: Dict[str, Tuple[str, tuple]]) -> List[Tuple]:
+        """Distinct reads needed by the specs, in first-use order"""
+        needs = []
+        for name, args in specs.values():
+            for need in NEEDS.get(name, lambda a: [])(args):
+                if need not in needs:
+                    needs.append(need)
+        return needs
+
+    def shared(self, need: Tuple):
+        if need not in self._shared:
+            self._shared[need] = self._compute(need)
+        return self._shared[need]
+
+    def _compute(self, need: Tuple):
+        df = self.df
+        kind = need[0]
+        # The full profile (distinct counts, duplicates) costs more than every
+        # template together; use it only if someone already paid for it
+        profile = DataProfiler.cached(df)
+        if kind == "nulls":
+            if profile is not None:
+                return pd.Series([c.nulls for c in profile.columns], index=df.columns, dtype=np.int64)
+            return df.isnull().sum()
+        if kind == "moments":
+            numeric = df.select_dtypes(include=['number']).columns
+            if profile is not None:
+                columns = {c.name: c for c in profile.columns if c.kind == "numeric"}
+                if list(columns) == list(numeric):
+                    return pd.DataFrame(
+                        [[c.count, c.mean, c.std, c.min, c.max, c.var] for c in columns.values()],
+                        index=numeric, columns=['count', 'mean', 'std', 'min', 'max', 'variance'])
+            return RunningStats.from_frame(df[numeric]).to_frame()
+        if kind == "quartiles":
+            if profile is not None and profile.exact_quantiles:
+                return {c.name: (c.q25, c.q50, c.q75) for c in profile.columns if c.kind == "numeric"}
+            # describe() reports exact quartiles; only this template pays for them
+            quartiles = {}
+            for name in df.select_dtypes(include=['number']).columns:
+                values = df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+                values = values[~np.isnan(values)]
+                if len(values):
+                    quartiles[name] = tuple(np.quantile(values, [0.25, 0.5, 0.75]))
+            return quartiles
+        if kind == "groups":
+            return GroupIndex.get(df, need[1])
+        if kind == "dates":
+            return TimeIndex.get(df, need[1])
+        if kind == "histogram":
+            return PlotAggregator.histogram_counts(df, need[1], HISTOGRAM_BINS)
+        if kind == "correlation":
+            return CorrelationEngine.matrix(df.select_dtypes(include=['number']))
+        raise KeyError(need)
+
+    def run(self, specs: Dict[str, Tuple[str, tuple]],
+            cancel: Optional[threading.Event] = None,
+            on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+        """Results for the prompts in `specs` that could be derived; each one
+        is also passed to `on_result(prompt, result)` as soon as it exists"""
+        for need in BatchPlanner.plan(specs):
+            if cancel is not None and cancel.is_set():
+                return {}
+            self.shared(need)
+
+        results = {}
+        for prompt, (name, args) in specs.items():
+            if cancel is not None and cancel.is_set():
+                break
+            derive: Callable = getattr(self, f"_{name}", None)
+            try:
+                result = derive(*args) if derive is not None else None
+            except (KeyError, ValueError, TypeError):
+                # Let the template itself run and report the problem
+                result = None
+            if result is not None:
+                results[prompt] = {"status": "ok", "stdout": "", **result}
+                if on_result is not None:
+                    on_result(prompt, results[prompt])
+        return results
+
+    # ----- charts -----
+
+    @staticmethod
+    def _png(draw: Callable, figsize: Tuple[float, float]) -> Dict:
+        # Figure without pyplot: no global state, safe in background threads
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=figsize)
+        draw(fig, fig.add_subplot())
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight", dpi=CHART_DPI)
+        return {"type": "image", "png": buffer.getvalue()}
+
+    # ----- templates -----
+
+    def _summarize(self) -> Dict:
+        df = self.df
+        info = [f"Rows: {len(df)}, Columns: {len(df.columns)}"]
+        info.append("Column types: " + ", ".join(
+            [f"{c}:{str(t)[:10]}" for c, t in zip(df.columns[:10], df.dtypes.iloc[:10])]))
+        miss = self.shared(("nulls",)).sort_values(ascending=False).head(10)
+        info.append("Top missing: " + ", ".join([f"{idx}:{val}" for idx, val in miss.items() if val > 0]))
+        numeric = df.select_dtypes(include=['number']).columns.tolist()
+        info.append(f"Numeric columns count: {len(numeric)}")
+        return {"type": "text", "output": "\n".join(["- " + i for i in info])}
+
+    def _top_counts(self, col) -> Dict:
+        self.shared(("groups", col))
+        return {"type": "dataframe", "df": GroupIndex.top_counts(self.df, col, 10)}
+
+    def _describe(self) -> Optional[Dict]:
+        moments = self.shared(("moments",))
+        quartiles = self.shared(("quartiles",))
+        if len(moments) == 0:
+            return None
+
+        rows = []
+        for name, m in moments.iterrows():
+            q25, q50, q75 = quartiles.get(name, (np.nan,) * 3)
+            rows.append([m['count'], m['mean'], m['std'], m['min'], q25, q50, q75, m['max']])
+        result = pd.DataFrame(rows, index=moments.index, dtype=np.float64,
+                              columns=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+        return {"type": "dataframe", "df": result}
+
+    def _histogram(self, col) -> Dict:
+        def draw(fig, ax):
+            PlotAggregator.histogram(self.df, col, bins=HISTOGRAM_BINS, ax=ax)
+            ax.set_title(f'Histogram of {col}')
+            ax.set_xlabel(f'{col}')
+            ax.set_ylabel('count')
+        return BatchPlanner._png(draw, (6, 4))
+
+    def _scatter(self, xcol, ycol) -> Dict:
+        def draw(fig, ax):
+            PlotAggregator.scatter(self.df, xcol, ycol, ax=ax)
+            ax.set_title(f'{ycol} vs {xcol}')
+        return BatchPlanner._png(draw, (6, 4))
+
+    def _top_rows(self, col) -> Dict:
+        df = self.df
+        values = df[col]
+        if (pd.api.types.is_numeric_dtype(values.dtype)
+                and not pd.api.types.is_bool_dtype(values.dtype)
+                and values.notna().sum() >= 10):
+            # O(n) selection; keep='first' breaks ties like a stable sort
+            positions = pd.Series(values.to_numpy()).nlargest(10, keep='first').index
+            result = df.iloc[positions]
+        else:
+            result = df.sort_values(col, ascending=False, kind='stable').head(10)
+        return {"type": "dataframe", "df": result.reset_index(drop=True)}
+
+    def _monthly_sum(self, ag, dcol) -> Dict:
+        self.shared(("dates", dcol))
+        return {"type": "dataframe", "df": RollupCube.query(self.df, dcol, "month", ag)}
+
+    def _monthly_count(self, dcol) -> Dict:
+        self.shared(("dates", dcol))
+        return {"type": "dataframe", "df": RollupCube.query(self.df, dcol, "month")}
+
+    def _correlation(self) -> Dict:
+        corr = self.shared(("correlation",))
+
+        def draw(fig, ax):
+            image = ax.imshow(corr, cmap='viridis', aspect='auto')
+            fig.colorbar(image, ax=ax)
+            ax.set_xticks(range(len(corr)), corr.columns, rotation=90)
+            ax.set_yticks(range(len(corr)), corr.columns)
+            ax.set_title('Correlation matrix')
+        return BatchPlanner._png(draw, (6, 5))
+
+    def _anomalies(self) -> Optional[Dict]:
+        df = self.df
+        moments = self.shared(("moments",))
+        if len(moments) == 0:
+            return {"type": "dataframe", "df": pd.DataFrame()}
+        if self.shared(("nulls",))[moments.index].any():
+            # The template scores complete rows only; not derivable from the moments
+            return None
+
+        # Population std, like scipy.stats.zscore; constant columns never score
+        count = moments['count'].to_numpy()
+        scale = np.sqrt(moments['variance'].to_numpy() * (count - 1) / count)
+        stats = {name: (center, s) for name, center, s in zip(moments.index, moments['mean'], scale)
+                 if s > 0 and np.isfinite(s)}
+        scores = OutlierDetector.score(df, "zscore", stats)["outlier_score"].to_numpy()
+        mask = scores > 3
+        return {"type": "dataframe", "df": df.loc[mask].head(20).reset_index(drop=True)}
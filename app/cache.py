@@ -0,0 +1,256 @@
+"""Dataset Caching Module"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import pandas as pd
+from config import (DATASET_CACHE_MB, DISK_CACHE_DIR, DISK_CACHE_MB,
+                    DISK_CACHE_MAX_AGE_DAYS)
+
+# Optional pyarrow import (disk cache is disabled without it)
+try:
+    import pyarrow as pa
+except Exception:
+    pa = None
+
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values"""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int]):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any) -> None:
+        size = int(self.sizeof(value))
+        with self._lock:
+            if key in self._items:
+                self.current_bytes -= self._items.pop(key)[1]
+
+            # Values bigger than the whole budget are never cached
+            if size > self.max_bytes:
+                return
+
+            self._items[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.current_bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._items),
+            "size_mb": self.current_bytes / (1024 ** 2),
+            "budget_mb": self.max_bytes / (1024 ** 2),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class DiskCache:
+    """Arrow IPC files of parsed datasets, reopened with memory mapping
+
+    Files survive server restarts and are shared by every session. Entries
+    older than max_age are dropped, then the least recently used ones until
+    the directory fits in max_bytes.
+    """
+
+    SUFFIX = ".arrow"
+
+    def __init__(self, directory: Path, max_bytes: int, max_age_seconds: float):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None
+
+    def path_for(self, key: str) -> Path:
+        name = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return self.directory / f"{name}{self.SUFFIX}"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        if not self.enabled:
+            return None
+
+        path = self.path_for(key)
+        try:
+            source = pa.memory_map(str(path), "r")
+            table = pa.ipc.open_file(source).read_all()
+        except (FileNotFoundError, pa.ArrowException, OSError):
+            return None
+
+        # mtime doubles as "last used" for age and size eviction
+        os.utime(path, None)
+        # split_blocks avoids consolidating columns into one big copy
+        return table.to_pandas(split_blocks=True)
+
+    def put(self, key: str, df: pd.DataFrame) -> bool:
+        if not self.enabled:
+            return False
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=None)
+        except (pa.ArrowException, TypeError, ValueError):
+            # Mixed-type object columns can't be stored; keep them in memory only
+            return False
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(key)
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            with pa.OSFile(str(tmp), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        with self._lock:
+            try:
+                entries = [(p, p.stat()) for p in self.directory.glob(f"*{self.SUFFIX}")]
+            except OSError:
+                return
+
+            now = time.time()
+            keep = []
+            for path, st in entries:
+                if now - st.st_mtime > self.max_age_seconds:
+                    path.unlink(missing_ok=True)
+                else:
+                    keep.append((path, st))
+
+            total = sum(st.st_size for _, st in keep)
+            for path, st in sorted(keep, key=lambda e: e[1].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= st.st_size
+
+    def clear(self) -> None:
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            path.unlink(missing_ok=True)
+
+
+def content_hash(file_source: Any) -> str:
+    """Hash the bytes of a path or file-like object without keeping a copy"""
+    h = hashlib.blake2b(digest_size=16)
+
+    if isinstance(file_source, (str, Path)):
+        with open(file_source, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    # Streamlit's UploadedFile exposes its buffer directly
+    if hasattr(file_source, "getbuffer"):
+        h.update(file_source.getbuffer())
+        return h.hexdigest()
+
+    pos = file_source.tell()
+    file_source.seek(0)
+    for block in iter(lambda: file_source.read(HASH_BLOCK_SIZE), b""):
+        if not block:
+            break
+        h.update(block.encode("utf-8") if isinstance(block, str) else block)
+    file_source.seek(pos)
+    return h.hexdigest()
+
+
+def dataset_key(digest: str, options: Dict) -> str:
+    """Cache key for a dataset: content hash plus the options it was loaded with"""
+    opts = ",".join(f"{k}={options[k]}" for k in sorted(options))
+    return f"{digest}:{opts}"
+
+
+# Fingerprints are tracked by object id rather than df.attrs, because pandas
+# copies attrs onto derived frames (head(), filters...) which hold other data.
+_fingerprints: Dict[int, str] = {}
+
+
+def register_fingerprint(df: pd.DataFrame, fingerprint: str) -> None:
+    """Remember which dataset a frame holds, for caches keyed by dataset"""
+    key = id(df)
+    if key not in _fingerprints:
+        weakref.finalize(df, _fingerprints.pop, key, None)
+    _fingerprints[key] = fingerprint
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """Stable identifier for the contents of a frame
+
+    Frames from the loader carry their content hash; anything else is
+    hashed once and remembered for the lifetime of the object.
+    """
+    fingerprint = _fingerprints.get(id(df))
+    if fingerprint is None:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr(list(df.columns)).encode("utf-8"))
+        h.update(repr([str(t) for t in df.dtypes]).encode("utf-8"))
+        try:
+            h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+            fingerprint = h.hexdigest()
+        except TypeError:
+            # Unhashable cells (lists, dicts): fall back to a per-object id
+            fingerprint = uuid.uuid4().hex
+        register_fingerprint(df, fingerprint)
+    return fingerprint
+
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    """Identifier for the column names and dtypes of a frame, not its rows"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    return h.hexdigest()
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+# One cache per server process, so every session reuses parsed uploads
+dataset_cache = LRUCache(DATASET_CACHE_MB * 1024 ** 2, frame_nbytes)
+disk_cache = DiskCache(DISK_CACHE_DIR, DISK_CACHE_MB * 1024 ** 2,
+                       DISK_CACHE_MAX_AGE_DAYS * 24 * 3600)
@@ -21,10 +21,76 @@ MAX_FILE_SIZE_MB = 200
 ALLOWED_EXTENSIONS = ["csv", "xlsx", "xls", "json"]
 MAX_ROWS_DISPLAY = 1000
 
+# Loading
+STREAMING_MIN_MB = 20  # CSV uploads at or above this size are parsed in chunks
+CSV_CHUNK_ROWS = 100_000
+OPTIMIZE_DTYPES = False  # downcast numerics / categorize strings after load
+
+# Caching
+DATASET_CACHE_MB = 1024  # parsed uploads kept in memory, shared by all sessions
+DISK_CACHE_DIR = DATA_DIR / "cache"  # Arrow IPC copies of parsed uploads
+DISK_CACHE_MB = 4096
+DISK_CACHE_MAX_AGE_DAYS = 7
+PROFILE_CACHE_ENTRIES = 32  # dataset profiles kept in memory
+SCHEMA_SAMPLE_SIZE = 50  # non-null values parsed per column to infer its type
+APPROX_DISTINCT_MIN_ROWS = 1_000_000  # above this, "Unique Values" is a HyperLogLog estimate
+HLL_PRECISION = 14  # 2**14 registers: ~0.8% standard error
+KLL_K = 200  # quantile sketch size: ~1% rank error
+HEAVY_HITTERS_CAPACITY = 1000  # Space-Saving counters: counts within ±rows/1000
+EXACT_QUANTILE_MAX_ROWS = 1_000_000  # smaller datasets get exact percentiles
+HASH_CHUNK_ROWS = 250_000  # rows hashed at a time for duplicate detection
+ROW_HASH_CACHE_MB = 256
+STATS_CHUNK_ROWS = 250_000  # rows per update of the streaming statistics
+DATE_INDEX_CACHE_MB = 256  # parsed datetime columns (sorted epochs + row order)
+ROLLUP_CACHE_MB = 64  # day/week/month/quarter aggregates per datetime column
+ROLLUP_WORKERS = 1  # threads building rollups in the background
+GROUP_INDEX_CACHE_MB = 256  # factorized categorical columns (codes + uniques)
+
+# Query backend for the built-in prompt templates: "pandas" or "duckdb"
+QUERY_BACKEND = os.getenv("QUERY_BACKEND", "pandas")
+
+# Code execution
+SANDBOX_WORKERS = 2  # pre-warmed processes running generated code (0 = run in-process)
+SANDBOX_TIMEOUT_S = 60  # wall-clock limit per run
+SANDBOX_MEMORY_MB = 4096  # address-space limit per worker, on top of the mapped dataset (0 = unlimited, POSIX only)
+RESULT_CACHE_MB = 256  # results (tables, charts, text) per dataset and code, all sessions
+PRECOMPUTE_WORKERS = 1  # suggestions computed in the background per session
+
+# Local LLM (Ollama HTTP API)
+OLLAMA_URL = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_KEEP_ALIVE = "30m"  # how long the server keeps a model loaded after a request
+OLLAMA_TIMEOUT_S = 60  # max wait for the first token, and between tokens
+OLLAMA_POOL_SIZE = 4  # idle keep-alive connections kept open
+LLM_PROMPT_TOKENS = {  # cap on prompt size per model family (estimated tokens)
+    "default": 1024,
+    "llama3.1": 2048,
+    "llama3": 2048,
+    "mistral": 1536,
+    "phi3": 768
+}
+LLM_EXAMPLE_VALUES = 3  # example values shown per non-numeric column
+LLM_VALUE_CHARS = 24  # longer example values are truncated
+LLM_CACHE_PATH = DATA_DIR / "llm_cache.sqlite3"  # generated code per (model, prompt, schema)
+LLM_CACHE_ENTRIES = 2000
+LLM_CACHE_MAX_AGE_DAYS = 30
+
 # Visualization
 CHART_DPI = 150
 PRIMARY_COLOR = "#1f77b4"
+HISTOGRAM_BINS = 30
+SCATTER_MAX_POINTS = 50_000  # larger scatter plots are drawn as a density grid
+SCATTER_GRID = 200  # bins per axis of that grid
 
 # Analysis
 OUTLIER_THRESHOLD = 3
+OUTLIER_THRESHOLDS = {  # default threshold per outlier method
+    "zscore": OUTLIER_THRESHOLD,
+    "modified_zscore": 3.5,
+    "iqr": 1.5
+}
+OUTLIER_BLOCK_COLUMNS = 16  # numeric columns scored together
+STRONG_CORRELATION = 0.7
+CORRELATION_BLOCK_COLUMNS = 256  # columns per block when building the matrix
+CORRELATION_MATRIX_MAX_COLUMNS = 100  # wider tables only show the top pairs
+CORRELATION_FLOAT32_MIN_COLUMNS = 400  # compute in float32 from this width on
 MAX_CATEGORIES = 50
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""Correlation Analysis Module"""
+import warnings
+from typing import List, Optional, Tuple
+import pandas as pd
+import numpy as np
+from config import CORRELATION_BLOCK_COLUMNS, STRONG_CORRELATION
+
+METHODS = {"pearson": "Pearson", "spearman": "Spearman (rank)"}
+
+
+class CorrelationEngine:
+    """Correlation matrices and strongest pairs for wide numeric tables
+
+    Columns are standardized one block at a time, straight into float64
+    or float32, and the matrix is built from products of column blocks.
+    Missing values are masked out: each pair is correlated over the rows
+    where both are present, as DataFrame.corr does, from per-pair counts,
+    sums and sums of squares that are block products too. Spearman is
+    Pearson on average ranks; with missing values it goes to pandas,
+    which ranks each pair again over its shared rows.
+    """
+
+    @staticmethod
+    def _standardized(df: pd.DataFrame, method: str, dtype=np.float64,
+                      block_columns: int = CORRELATION_BLOCK_COLUMNS
+                      ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], List]:
+        """(z, present, names): z-scores with missing values as 0, and where
+        the values are present (None if all are); z is None if pandas must do it"""
+        if method not in METHODS:
+            raise ValueError(f"Unknown correlation method: {method}")
+
+        numeric = df.select_dtypes(include=[np.number])
+        names = list(numeric.columns)
+        if method == "spearman":
+            if numeric.isna().any().any():
+                return None, None, names
+            numeric = numeric.rank()
+        rows, k = numeric.shape
+        if rows < 2:
+            return None, None, names
+
+        z = np.empty((rows, k), dtype=dtype)
+        present = None
+        for start in range(0, k, block_columns):
+            cols = slice(start, min(start + block_columns, k))
+            values = numeric.iloc[:, cols].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+            missing = np.isnan(values)
+            if missing.any():
+                if present is None:
+                    present = np.ones((rows, k), dtype=bool)
+                present[:, cols] = ~missing
+            with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+                # Constant and all-missing columns become NaN, as in DataFrame.corr
+                warnings.simplefilter("ignore", RuntimeWarning)
+                std = np.nanstd(values, axis=0, ddof=1)
+                values -= np.nanmean(values, axis=0)
+                values /= std
+            values[missing] = 0.0
+            z[:, cols] = values
+        return z, present, names
+
+    @staticmethod
+    def _blocks(k: int, block: int):
+        for i in range(0, k, block):
+            for j in range(i, k, block):
+                yield slice(i, min(i + block, k)), slice(j, min(j + block, k))
+
+    @staticmethod
+    def _block(z: np.ndarray, present: Optional[np.ndarray], rows: slice, cols: slice) -> np.ndarray:
+        a, b = z[:, rows], z[:, cols]
+        if present is None:
+            return a.T @ b / (len(z) - 1)
+
+        # Over the rows where both columns of a pair are present
+        in_a, in_b = present[:, rows].astype(z.dtype), present[:, cols].astype(z.dtype)
+        count = in_a.T @ in_b
+        sum_a, sum_b = a.T @ in_b, in_a.T @ b
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var_a = (a * a).T @ in_b - sum_a * sum_a / count
+            var_b = in_a.T @ (b * b) - sum_b * sum_b / count
+            r = (a.T @ b - sum_a * sum_b / count) / np.sqrt(var_a * var_b)
+        r[(count < 2) | ~(var_a > 0) | ~(var_b > 0)] = np.nan
+        return r
+
+    @staticmethod
+    def matrix(df: pd.DataFrame, method: str = "pearson", float32: bool = False,
+               block_columns: int = CORRELATION_BLOCK_COLUMNS) -> pd.DataFrame:
+        """Full correlation matrix of the numeric columns"""
+        z, present, names = CorrelationEngine._standardized(
+            df, method, np.float32 if float32 else np.float64, block_columns)
+        if z is None:
+            return df.select_dtypes(include=[np.number]).corr(method=method)
+
+        k = len(names)
+        out = np.empty((k, k), dtype=z.dtype)
+        for rows, cols in CorrelationEngine._blocks(k, block_columns):
+            block = CorrelationEngine._block(z, present, rows, cols)
+            out[rows, cols] = block
+            out[cols, rows] = block.T
+        np.clip(out, -1.0, 1.0, out=out)
+        return pd.DataFrame(out, index=names, columns=names)
+
+    @staticmethod
+    def strong_pairs(correlation: pd.DataFrame,
+                     threshold: float = STRONG_CORRELATION) -> pd.DataFrame:
+        """Pairs above the threshold from the upper triangle, in matrix order"""
+        names = np.asarray(correlation.columns, dtype=object)
+        i, j = np.triu_indices(len(names), k=1)
+        values = correlation.to_numpy()[i, j]
+        mask = np.abs(values) > threshold
+        return pd.DataFrame({
+            'Variable 1': names[i[mask]],
+            'Variable 2': names[j[mask]],
+            'Correlation': np.round(values[mask].astype(np.float64), 3)
+        })
+
+    @staticmethod
+    def top_pairs(df: pd.DataFrame, n: int = 20, method: str = "pearson",
+                  float32: bool = False,
+                  block_columns: int = CORRELATION_BLOCK_COLUMNS) -> pd.DataFrame:
+        """The n pairs with the largest |r|, keeping only one block in memory"""
+        z, present, names = CorrelationEngine._standardized(
+            df, method, np.float32 if float32 else np.float64, block_columns)
+        if z is None:
+            correlation = df.select_dtypes(include=[np.number]).corr(method=method)
+            pairs = CorrelationEngine.strong_pairs(correlation, threshold=-1.0)
+            order = np.argsort(-np.abs(pairs['Correlation'].to_numpy()), kind="stable")
+            return pairs.iloc[order[:n]].reset_index(drop=True)
+
+        best_r = np.empty(0)
+        best_i = np.empty(0, dtype=np.int64)
+        best_j = np.empty(0, dtype=np.int64)
+        for rows, cols in CorrelationEngine._blocks(len(names), block_columns):
+            block = CorrelationEngine._block(z, present, rows, cols).astype(np.float64)
+            bi, bj = np.indices(block.shape)
+            bi, bj = bi.ravel() + rows.start, bj.ravel() + cols.start
+            r = block.ravel()
+            keep = (bi < bj) & ~np.isnan(r)
+            r, bi, bj = r[keep], bi[keep], bj[keep]
+            if len(r) > n:
+                top = np.argpartition(-np.abs(r), n)[:n]
+                r, bi, bj = r[top], bi[top], bj[top]
+
+            best_r = np.concatenate([best_r, r])
+            best_i = np.concatenate([best_i, bi])
+            best_j = np.concatenate([best_j, bj])
+            if len(best_r) > n:
+                top = np.argpartition(-np.abs(best_r), n)[:n]
+                best_r, best_i, best_j = best_r[top], best_i[top], best_j[top]
+
+        order = np.lexsort((best_j, best_i, -np.abs(best_r)))[:n]
+        labels = np.asarray(names, dtype=object)
+        return pd.DataFrame({
+            'Variable 1': labels[best_i[order]],
+            'Variable 2': labels[best_j[order]],
+            'Correlation': np.round(np.clip(best_r[order], -1.0, 1.0), 3)
+        })
@@ -1,52 +1,220 @@
 """Data Loading Module"""
 import io
 from pathlib import Path
-from typing import Union, Any
+from typing import Union, Any, Callable, Dict, Optional
 import pandas as pd
+from config import STREAMING_MIN_MB, CSV_CHUNK_ROWS, OPTIMIZE_DTYPES, PROFILE_CACHE_ENTRIES
+from cache import (LRUCache, content_hash, dataset_cache, dataset_fingerprint, dataset_key,
+                   disk_cache, register_fingerprint)
+from optimizer import DataOptimizer
+from sketches import distinct_sketches, sketch_cache
+
+
+# Called with (fraction_done, chunk) after every parsed chunk
+ProgressCallback = Callable[[float, pd.DataFrame], None]
 
 
 class DataLoader:
     """Handles data loading"""
-    
+
+    # Dtype optimization reports, by dataset key, kept as long as recent profiles
+    memory_reports = LRUCache(PROFILE_CACHE_ENTRIES, lambda report: 1)
+
     @staticmethod
-    def load_file(file_source: Union[str, Path, Any]) -> pd.DataFrame:
-        """Load data from file"""
+    def _source_size(file_source: Any) -> Optional[int]:
+        """Total size in bytes of a file-like object, if it can be found"""
+        size = getattr(file_source, "size", None)
+        if size is not None:
+            return int(size)
+
         try:
-            # Handle file paths
-            if isinstance(file_source, (str, Path)):
-                path = Path(file_source)
-                suffix = path.suffix.lower()
-                
-                if suffix == ".csv":
-                    return pd.read_csv(path)
-                elif suffix in [".xlsx", ".xls"]:
-                    return pd.read_excel(path)
-                elif suffix == ".json":
-                    return pd.read_json(path)
-            
-            # Handle uploaded files (Streamlit)
-            filename = getattr(file_source, "name", "")
-            suffix = Path(filename).suffix.lower()
-            data = file_source.read()
-            
-            if isinstance(data, str):
-                data = data.encode("utf-8")
-            
-            buffer = io.BytesIO(data)
-            
-            if suffix == ".csv":
-                buffer.seek(0)
-                return pd.read_csv(buffer)
-            elif suffix in [".xlsx", ".xls"]:
-                buffer.seek(0)
-                return pd.read_excel(buffer)
-            elif suffix == ".json":
-                buffer.seek(0)
-                return pd.read_json(buffer)
-            
-            # Default to CSV
-            buffer.seek(0)
-            return pd.read_csv(buffer)
-            
+            pos = file_source.tell()
+            end = file_source.seek(0, io.SEEK_END)
+            file_source.seek(pos)
+            return int(end)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _sample_dtypes(file_source: Any, nrows: int) -> Dict[int, Any]:
+        """Dtypes to fix for every chunk, by column position, from the first rows
+
+        Float and string columns are fixed, so a chunk without decimals or
+        with only numeric-looking text parses like the rest of the file.
+        Integer and boolean columns aren't: a later chunk with missing
+        values widens them, as a one-shot parse would.
+        """
+        if isinstance(file_source, (str, Path)):
+            sample = pd.read_csv(file_source, nrows=nrows)
+        else:
+            pos = file_source.tell()
+            sample = pd.read_csv(file_source, nrows=nrows)
+            file_source.seek(pos)
+        return {i: dtype for i, dtype in enumerate(sample.dtypes)
+                if pd.api.types.is_float_dtype(dtype)
+                or (pd.api.types.is_string_dtype(dtype) and dtype != object)}
+
+    @staticmethod
+    def read_csv(file_source: Any,
+                 chunksize: Optional[int] = None,
+                 progress: Optional[ProgressCallback] = None,
+                 sketches: Optional[Dict] = None) -> pd.DataFrame:
+        """Read a CSV, streaming it in chunks when the source is large
+
+        The file object is handed to pandas directly, so the raw upload is
+        never copied into a second buffer. When streaming, dtypes are fixed
+        from the first chunk's rows, each chunk is split into its columns
+        as it arrives and the columns are joined one at a time, so the
+        chunks are never held alongside the finished frame. Per-column
+        distinct-count sketches are merged into `sketches` chunk by chunk.
+        """
+        size = DataLoader._source_size(file_source)
+
+        if chunksize is None:
+            if size is None or size < STREAMING_MIN_MB * 1024 ** 2:
+                return pd.read_csv(file_source)
+            chunksize = CSV_CHUNK_ROWS
+
+        start = None if isinstance(file_source, (str, Path)) else file_source.tell()
+        dtype = DataLoader._sample_dtypes(file_source, chunksize)
+        try:
+            return DataLoader._read_chunks(file_source, chunksize, dtype, size, progress, sketches)
+        except ValueError:
+            if not dtype:
+                raise
+            # A fixed dtype didn't fit a later chunk (e.g. text in a float
+            # column): parse the whole file in one go, as pandas infers it
+            if start is not None:
+                file_source.seek(start)
+            if sketches is not None:
+                sketches.clear()
+            return pd.read_csv(file_source)
+
+    @staticmethod
+    def _read_chunks(file_source: Any, chunksize: int, dtype: Optional[Dict[int, Any]],
+                     size: Optional[int], progress: Optional[ProgressCallback],
+                     sketches: Optional[Dict]) -> pd.DataFrame:
+        columns, pieces = None, []
+        with pd.read_csv(file_source, chunksize=chunksize, dtype=dtype) as reader:
+            for chunk in reader:
+                if columns is None:
+                    columns = chunk.columns
+                    pieces = [[] for _ in columns]
+                if sketches is not None:
+                    distinct_sketches([chunk], sketches)
+                if progress is not None:
+                    try:
+                        done = min(file_source.tell() / size, 1.0) if size else 0.0
+                    except Exception:
+                        done = 0.0
+                    progress(done, chunk)
+                # Own copies, so the chunk's blocks are freed right away
+                for i in range(len(columns)):
+                    pieces[i].append(chunk.iloc[:, i].copy())
+                del chunk
+
+        if columns is None:
+            return pd.DataFrame()
+        data = {}
+        for i in range(len(columns)):
+            parts, pieces[i] = pieces[i], None
+            data[i] = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+            del parts
+        # copy=False keeps one block per column instead of consolidating them
+        df = pd.DataFrame(data, copy=False)
+        df.columns = columns
+        return df
+
+    @staticmethod
+    def load_file(file_source: Union[str, Path, Any],
+                  progress: Optional[ProgressCallback] = None,
+                  use_cache: bool = True,
+                  optimize: bool = OPTIMIZE_DTYPES) -> pd.DataFrame:
+        """Load data from file
+
+        Parsed frames are cached by content hash, in memory and as Arrow
+        files under DATA_DIR, so Streamlit reruns, other sessions and
+        server restarts skip the parse entirely. With `optimize`, dtypes
+        are compacted once before caching (see memory_report).
+        """
+        try:
+            if not use_cache:
+                df = DataLoader._parse(file_source, progress)
+                return DataOptimizer.optimize(df)[0] if optimize else df
+
+            key = dataset_key(content_hash(file_source),
+                              {"format": DataLoader._suffix(file_source),
+                               "optimize": optimize})
+            sketches = {}
+            df = DataLoader.load_cached(
+                key, lambda: DataLoader._parse(file_source, progress, sketches),
+                optimize=optimize)
+            if sketches:
+                sketch_cache.put(key, sketches)
+            return df
+
         except Exception as e:
-            raise ValueError(f"Failed to load file: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Failed to load file: {str(e)}")
+
+    @staticmethod
+    def load_cached(key: str, parse: Callable[[], pd.DataFrame],
+                    optimize: bool = False) -> pd.DataFrame:
+        """Look a dataset up in memory, then on disk, and only then parse it"""
+        df = dataset_cache.get(key)
+        if df is None:
+            df = disk_cache.get(key)
+            if df is None:
+                df = parse()
+                if optimize:
+                    df, report = DataOptimizer.optimize(df)
+                    DataLoader.memory_reports.put(key, report)
+                disk_cache.put(key, df)
+            dataset_cache.put(key, df)
+
+        # The cached frame is shared; hand out a view so callers adding
+        # or dropping columns don't change it for everyone else
+        df = df.copy(deep=False)
+        register_fingerprint(df, key)
+        return df
+
+    @staticmethod
+    def memory_report(df: pd.DataFrame) -> Optional[Dict]:
+        """Before/after memory of the dtype optimization for a loaded frame"""
+        return DataLoader.memory_reports.get(dataset_fingerprint(df))
+
+    @staticmethod
+    def _suffix(file_source: Union[str, Path, Any]) -> str:
+        if isinstance(file_source, (str, Path)):
+            return Path(file_source).suffix.lower()
+        return Path(getattr(file_source, "name", "") or "").suffix.lower()
+
+    @staticmethod
+    def _parse(file_source: Union[str, Path, Any],
+               progress: Optional[ProgressCallback] = None,
+               sketches: Optional[Dict] = None) -> pd.DataFrame:
+        suffix = DataLoader._suffix(file_source)
+
+        # Handle file paths
+        if isinstance(file_source, (str, Path)):
+            path = Path(file_source)
+
+            if suffix in [".xlsx", ".xls"]:
+                return pd.read_excel(path)
+            elif suffix == ".json":
+                return pd.read_json(path)
+
+            with open(path, "rb") as f:
+                return DataLoader.read_csv(f, progress=progress, sketches=sketches)
+
+        # Handle uploaded files (Streamlit)
+        # Streamlit reruns may hand back a file that was already read
+        if hasattr(file_source, "seek"):
+            file_source.seek(0)
+
+        if suffix in [".xlsx", ".xls"]:
+            return pd.read_excel(file_source)
+        elif suffix == ".json":
+            return pd.read_json(file_source)
+
+        # CSV and default
+        return DataLoader.read_csv(file_source, progress=progress, sketches=sketches)
@@ -0,0 +1,76 @@
+"""Duplicate Detection Module"""
+import pandas as pd
+import numpy as np
+from config import HASH_CHUNK_ROWS, ROW_HASH_CACHE_MB
+from cache import LRUCache, dataset_fingerprint
+
+
+class DuplicateDetector:
+    """Duplicate rows found through cached 64-bit row hashes
+
+    Rows are hashed once per dataset, chunk by chunk, so memory stays at
+    8 bytes per row whatever the width of the frame. Two different rows
+    collide with probability 2**-64, which is negligible for the sizes
+    handled here.
+    """
+
+    _hashes = LRUCache(ROW_HASH_CACHE_MB * 1024 ** 2, lambda arr: arr.nbytes)
+
+    @staticmethod
+    def row_hashes(df: pd.DataFrame) -> np.ndarray:
+        fingerprint = dataset_fingerprint(df)
+        hashes = DuplicateDetector._hashes.get(fingerprint)
+        if hashes is not None:
+            return hashes
+
+        hashes = np.empty(len(df), dtype=np.uint64)
+        for start in range(0, len(df), HASH_CHUNK_ROWS):
+            chunk = df.iloc[start:start + HASH_CHUNK_ROWS]
+            hashes[start:start + len(chunk)] = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+
+        DuplicateDetector._hashes.put(fingerprint, hashes)
+        return hashes
+
+    @staticmethod
+    def duplicated_mask(df: pd.DataFrame) -> np.ndarray:
+        """Same as df.duplicated(keep='first'), from the cached hashes"""
+        if len(df.columns) == 0:
+            return np.zeros(len(df), dtype=bool)
+        return pd.Series(DuplicateDetector.row_hashes(df)).duplicated().to_numpy()
+
+    @staticmethod
+    def count(df: pd.DataFrame) -> int:
+        return int(DuplicateDetector.duplicated_mask(df).sum())
+
+    @staticmethod
+    def groups(df: pd.DataFrame, limit: int = 100) -> pd.DataFrame:
+        """Groups of identical rows, largest first, with their row labels"""
+        if len(df) == 0 or len(df.columns) == 0:
+            return pd.DataFrame(columns=['Group', 'Copies', 'Rows'])
+
+        hashes = DuplicateDetector.row_hashes(df)
+        _, first, inverse, counts = np.unique(hashes, return_index=True,
+                                              return_inverse=True, return_counts=True)
+        candidates = np.flatnonzero(counts > 1)
+        if len(candidates) == 0:
+            return pd.DataFrame(columns=['Group', 'Copies', 'Rows'])
+
+        # Largest groups first, ties broken by first occurrence
+        ranked = candidates[np.lexsort((first[candidates], -counts[candidates]))][:limit]
+        rank_of = np.full(len(counts), -1)
+        rank_of[ranked] = np.arange(len(ranked))
+        ranks = rank_of[inverse]
+        rows = np.flatnonzero(ranks >= 0)
+        rows = rows[np.argsort(ranks[rows], kind="stable")]
+        members = np.split(rows, np.cumsum(counts[ranked])[:-1])
+
+        return pd.DataFrame({
+            'Group': range(1, len(ranked) + 1),
+            'Copies': counts[ranked],
+            'Rows': [df.index[m].tolist() for m in members]
+        })
+
+    @staticmethod
+    def deduplicate(df: pd.DataFrame) -> pd.DataFrame:
+        """Drop repeated rows, keeping the first of each group"""
+        return df.loc[~DuplicateDetector.duplicated_mask(df)]
@@ -0,0 +1,163 @@
+"""Categorical Group Index Module"""
+from typing import Optional
+import pandas as pd
+import numpy as np
+from config import GROUP_INDEX_CACHE_MB, STATS_CHUNK_ROWS
+from cache import LRUCache, dataset_fingerprint
+from schema import SchemaInferer
+from sketches import SpaceSaving, heavy_hitters_cache
+
+
+class GroupIndex:
+    """A categorical column factorized once into integer codes
+
+    `codes` gives each row the position of its value in `uniques`, in the
+    smallest integer type that fits; missing values are a group of their
+    own, as in value_counts(dropna=False). Indexes are cached per dataset
+    and column, so top-k counts and grouped sums or means are np.bincount
+    calls over the codes and the column is never hashed again. Columns
+    with more than MAX_CATEGORIES distinct values are not indexed; their
+    top-k counts come from a Space-Saving sketch.
+    """
+
+    _cache = LRUCache(GROUP_INDEX_CACHE_MB * 1024 ** 2, lambda index: index.nbytes)
+
+    def __init__(self, codes: np.ndarray, uniques: pd.Index, na_code: Optional[int]):
+        self.codes = codes
+        self.uniques = uniques
+        self.na_code = na_code
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + int(self.uniques.memory_usage(deep=True))
+
+    @property
+    def distinct(self) -> int:
+        """Distinct non-null values that occur (unused categories don't count)"""
+        return int(np.count_nonzero(self.counts())) - (self.na_code is not None)
+
+    def counts(self) -> np.ndarray:
+        return np.bincount(self.codes, minlength=len(self.uniques))
+
+    @staticmethod
+    def from_series(col: pd.Series) -> "GroupIndex":
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            # Already coded: categories in their order, then missing values
+            codes = col.cat.codes.to_numpy()
+            n = len(col.cat.categories)
+            na_code = n if (codes < 0).any() else None
+            codes = np.where(codes < 0, n, codes) if na_code is not None else codes
+            labels = np.arange(n + (na_code is not None))
+            labels[n:] = -1
+            uniques = pd.CategoricalIndex(pd.Categorical.from_codes(labels, dtype=col.dtype))
+        else:
+            codes, uniques = pd.factorize(col, use_na_sentinel=False)
+            missing = np.flatnonzero(pd.isna(uniques))
+            na_code = int(missing[0]) if len(missing) else None
+        codes = codes.astype(np.min_scalar_type(max(len(uniques) - 1, 0)), copy=False)
+        return GroupIndex(codes, pd.Index(uniques), na_code)
+
+    @staticmethod
+    def build(df: pd.DataFrame, name, col: pd.Series = None) -> "GroupIndex":
+        """Factorize df[name] (or `col`, the same column by position) and cache it"""
+        key = f"{dataset_fingerprint(df)}:{name!r}"
+        index = GroupIndex._cache.get(key)
+        if index is None:
+            index = GroupIndex.from_series(df[name] if col is None else col)
+            GroupIndex._cache.put(key, index)
+        return index
+
+    @staticmethod
+    def get(df: pd.DataFrame, name) -> Optional["GroupIndex"]:
+        """The index of a categorical column; None for high-cardinality ones"""
+        key = f"{dataset_fingerprint(df)}:{name!r}"
+        index = GroupIndex._cache.get(key)
+        if index is not None:
+            return index
+        if isinstance(df[name].dtype, pd.CategoricalDtype) or \
+                name in SchemaInferer.infer(df)["categorical"]:
+            return GroupIndex.build(df, name)
+        return None
+
+    @staticmethod
+    def heavy_hitters(df: pd.DataFrame, name) -> SpaceSaving:
+        """The Space-Saving sketch of a column, built in one chunked pass"""
+        key = f"{dataset_fingerprint(df)}:{name!r}"
+        sketch = heavy_hitters_cache.get(key)
+        if sketch is None:
+            sketch = SpaceSaving()
+            col = df[name]
+            for start in range(0, len(col), STATS_CHUNK_ROWS):
+                sketch.update(col.iloc[start:start + STATS_CHUNK_ROWS])
+            heavy_hitters_cache.put(key, sketch)
+        return sketch
+
+    @staticmethod
+    def top_counts(df: pd.DataFrame, name, k: int = 10) -> pd.DataFrame:
+        """The k most frequent values and their counts, missing values included
+
+        Same table as df[name].value_counts(dropna=False).head(k) with
+        columns ['value', 'count'].
+        """
+        index = GroupIndex.get(df, name)
+        if index is not None:
+            counts = index.counts()
+            order = np.argsort(-counts, kind="stable")[:k]
+            values, counts = index.uniques.take(order), counts[order]
+        else:
+            values, counts, exact = GroupIndex.heavy_hitters(df, name).top(k)
+            if exact:
+                values = values.astype(df[name].dtype)
+            else:
+                # Too flat for the sketch to rank exactly: count every value
+                result = df[name].value_counts(dropna=False).head(k)
+                values, counts = result.index, result.array
+        # The count dtype value_counts gives this column (Int64 for nullable ones)
+        dtype = df[name].iloc[:0].value_counts(dropna=False).dtype
+        return pd.DataFrame({"value": values, "count": pd.array(counts).astype(dtype)})
+
+    @staticmethod
+    def aggregate(df: pd.DataFrame, key, value, stat: str = "sum") -> pd.Series:
+        """df.groupby(key)[value].agg(stat) for stat in count / sum / mean
+
+        Answered with np.bincount over the key's codes when it is
+        categorical; other columns, statistics and dtypes go to groupby.
+        """
+        dtype = df[value].dtype
+        index = GroupIndex.get(df, key)
+        if index is None or stat not in ("count", "sum", "mean") \
+                or isinstance(index.uniques, pd.CategoricalIndex) \
+                or not isinstance(dtype, np.dtype) or dtype.kind not in "iuf":
+            return df.groupby(key)[value].agg(stat)
+
+        values = df[value].to_numpy()
+
+        groups = len(index.uniques)
+        if values.dtype.kind == "f":
+            present = ~np.isnan(values)
+            counts = np.bincount(index.codes[present], minlength=groups)
+            sums = np.bincount(index.codes, weights=np.where(present, values, 0.0), minlength=groups)
+        else:
+            # Exact integer sums: bincount weights go through float64
+            counts = index.counts()
+            sums = np.zeros(groups, dtype=np.int64 if values.dtype.kind == "i" else np.uint64)
+            np.add.at(sums, index.codes, values.astype(sums.dtype, copy=False))
+
+        if stat == "count":
+            result = counts
+        elif stat == "sum":
+            result = sums
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result = sums / counts
+        if stat != "count" and values.dtype.kind == "f":
+            result = result.astype(values.dtype, copy=False)
+
+        # groupby drops missing keys and sorts the rest
+        labels = index.uniques
+        keep = np.arange(groups) != (index.na_code if index.na_code is not None else -1)
+        try:
+            order = np.flatnonzero(keep)[labels[keep].argsort()]
+        except TypeError:
+            return df.groupby(key)[value].agg(stat)
+        return pd.Series(result[order], index=labels.take(order).rename(key), name=value)
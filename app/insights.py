@@ -3,6 +3,8 @@ AI-Powered Insights Generator
 """
 import pandas as pd
 import numpy as np
+from config import OUTLIER_BLOCK_COLUMNS
+from profiler import DataProfile, DataProfiler
 
 
 class InsightsGenerator:
@@ -92,7 +94,7 @@ class InsightsGenerator:
             insights.append({
                 'icon': '💾',
                 'title': 'Large Memory Footprint',
-                'description': f'{memory_mb:.1f} MB in memory. Consider data type optimization.',
+                'description': f'{memory_mb:.1f} MB in memory. Consider data type optimization (⚡ Optimize Memory Usage in the sidebar).',
                 'impact': 'low'
             })
         
@@ -110,23 +112,24 @@ class InsightsGenerator:
                 'icon': '📅',
                 'title': 'Time Series Analysis Possible',
                 'description': f'Found {len(types["datetime"])} datetime column(s). Time-based trends can be analyzed.',
-                'impact': 'high'
+                'impact': 'high',
+                'link': ('#time-trends', 'View trend charts')
             })
         
         return insights
     
     @staticmethod
-    def generate_numeric_insights(df: pd.DataFrame) -> list:
+    def generate_numeric_insights(df: pd.DataFrame, profile: DataProfile = None) -> list:
         """Generate insights for numeric columns"""
         insights = []
-        numeric_df = df.select_dtypes(include=[np.number])
+        profile = profile or DataProfiler.profile(df)
+        numeric = [c for c in profile.columns if c.kind == "numeric"]
         
-        if len(numeric_df.columns) == 0:
+        if len(numeric) == 0:
             return insights
         
         # Variance insights
-        variances = numeric_df.var()
-        low_variance = variances[variances < 0.01].index.tolist()
+        low_variance = [c.name for c in numeric if c.var is not None and c.var < 0.01]
         
         if low_variance:
             insights.append({
@@ -136,20 +139,52 @@ class InsightsGenerator:
                 'impact': 'medium'
             })
         
-        # Outlier potential
-        for col in numeric_df.columns[:3]:  # Check first 3 columns
-            q1 = numeric_df[col].quantile(0.25)
-            q3 = numeric_df[col].quantile(0.75)
-            iqr = q3 - q1
-            outlier_count = ((numeric_df[col] < (q1 - 1.5 * iqr)) | 
-                           (numeric_df[col] > (q3 + 1.5 * iqr))).sum()
-            
-            if outlier_count > len(df) * 0.05:  # More than 5% outliers
-                insights.append({
-                    'icon': '🎯',
-                    'title': f'Outliers in {col}',
-                    'description': f'{outlier_count} potential outliers detected ({outlier_count/len(df)*100:.1f}%).',
-                    'impact': 'medium'
-                })
-        
-        return insights
\ No newline at end of file
+        # Outlier potential, across every numeric column
+        outliers = InsightsGenerator.iqr_outliers(df, profile)
+        flagged = outliers[outliers['share'] > 0.05]  # More than 5% outliers
+        
+        for col, row in flagged.head(3).iterrows():
+            insights.append({
+                'icon': '🎯',
+                'title': f'Outliers in {col}',
+                'description': f'{int(row["count"])} potential outliers detected ({row["share"]*100:.1f}%).',
+                'impact': 'medium'
+            })
+        
+        if len(flagged) > 3:
+            insights.append({
+                'icon': '🎯',
+                'title': 'Outliers in More Columns',
+                'description': f'{len(flagged) - 3} more columns have over 5% values outside the IQR fences.',
+                'impact': 'low'
+            })
+        
+        return insights
+    
+    @staticmethod
+    def iqr_outliers(df: pd.DataFrame, profile: DataProfile = None) -> pd.DataFrame:
+        """Count and share of rows outside the 1.5×IQR fences, per numeric column, highest first"""
+        profile = profile or DataProfiler.profile(df)
+        numeric = [c for c in profile.columns if c.kind == "numeric" and c.q25 is not None]
+        if not numeric or len(df) == 0:
+            return pd.DataFrame({'count': pd.Series(dtype=np.int64), 'share': pd.Series(dtype=float)})
+        
+        if profile.exact_quantiles:
+            q1 = np.array([c.q25 for c in numeric])
+            q3 = np.array([c.q75 for c in numeric])
+            lower, upper = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+        else:
+            # Fences from the profiling sketches, like the quartiles themselves
+            fences = [DataProfiler.quantile_sketch(df, c.name).iqr_fences() for c in numeric]
+            lower, upper = (np.array(f) for f in zip(*fences))
+        
+        # Count fence violations a block of columns at a time
+        counts = np.zeros(len(numeric), dtype=np.int64)
+        names = [c.name for c in numeric]
+        for start in range(0, len(names), OUTLIER_BLOCK_COLUMNS):
+            block = slice(start, start + OUTLIER_BLOCK_COLUMNS)
+            values = df[names[block]].to_numpy(dtype=np.float64, na_value=np.nan)
+            counts[block] = ((values < lower[block]) | (values > upper[block])).sum(axis=0)
+        
+        outliers = pd.DataFrame({'count': counts, 'share': counts / len(df)}, index=names)
+        return outliers.sort_values('share', ascending=False, kind="stable")
\ No newline at end of file
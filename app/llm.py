@@ -0,0 +1,269 @@
+"""Local LLM Client Module"""
+import hashlib
+import http.client
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+from config import (LLM_CACHE_ENTRIES, LLM_CACHE_MAX_AGE_DAYS, LLM_CACHE_PATH,
+                    OLLAMA_KEEP_ALIVE, OLLAMA_POOL_SIZE, OLLAMA_TIMEOUT_S, OLLAMA_URL)
+
+# A pooled connection the server already closed fails on first use; retry once
+_STALE = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class LLMError(Exception):
+    """The Ollama server answered with an error"""
+
+
+class OllamaClient:
+    """Streaming client for the Ollama HTTP API
+
+    Connections are kept alive and reused from a small pool, so a prompt
+    costs one request on an open socket instead of a process start. Every
+    request passes keep_alive, which keeps the model loaded between
+    prompts. Tokens are yielded as the server sends them.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_URL, keep_alive: str = OLLAMA_KEEP_ALIVE,
+                 timeout: float = OLLAMA_TIMEOUT_S, pool_size: int = OLLAMA_POOL_SIZE):
+        if "://" not in base_url:
+            base_url = f"http://{base_url}"
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 11434
+        self.https = parts.scheme == "https"
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self, timeout: float) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout)
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _post(self, path: str, payload: Dict, timeout: float):
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        for attempt in range(2):
+            try:
+                conn = self._pool.get_nowait()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                pooled = True
+            except queue.Empty:
+                conn, pooled = self._connect(timeout), False
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except _STALE:
+                conn.close()
+                if not pooled or attempt:
+                    raise
+            except Exception:
+                conn.close()
+                raise
+
+    def stream(self, prompt: str, model: str, timeout: float = None,
+               **options) -> Iterator[str]:
+        """Yield response tokens as they arrive
+
+        `timeout` bounds the wait for each read, i.e. time to first token
+        and the gap between tokens, not the whole generation.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True,
+                   "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        conn, response = self._post("/api/generate", payload, timeout or self.timeout)
+
+        done = False
+        try:
+            if response.status != 200:
+                detail = response.read().decode("utf-8", errors="replace")
+                done = True
+                try:
+                    detail = json.loads(detail).get("error", detail)
+                except (ValueError, AttributeError):
+                    pass
+                raise LLMError(f"HTTP {response.status}: {detail}")
+
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise LLMError(message["error"])
+                if message.get("response"):
+                    yield message["response"]
+                if message.get("done"):
+                    break
+            # Drain the end of the chunked body so the connection can be reused
+            response.read()
+            done = True
+        finally:
+            if done and not response.will_close:
+                self._release(conn)
+            else:
+                conn.close()
+
+    def generate(self, prompt: str, model: str, timeout: float = None, **options) -> str:
+        return "".join(self.stream(prompt, model, timeout=timeout, **options))
+
+    def warm(self, model: str) -> None:
+        """Load the model now, so the first prompt doesn't wait for it"""
+        conn, response = self._post("/api/generate",
+                                    {"model": model, "keep_alive": self.keep_alive},
+                                    self.timeout)
+        response.read()
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        if response.status != 200:
+            raise LLMError(f"HTTP {response.status}")
+
+
+class ResponseCache:
+    """Code generated by the LLM, keyed by (model, prompt, dataset schema)
+
+    Stored in SQLite so it survives restarts and is shared by all sessions.
+    Prompts are compared after normalizing case and whitespace (quoted
+    column names are kept as written); the schema is the column names and
+    dtypes, so the same question on tomorrow's file with the same layout
+    is a hit. Only code that compiles is stored. Entries expire after
+    max_age, and the least recently used go once there are more than
+    max_entries.
+    """
+
+    def __init__(self, path: Path, max_entries: int, max_age_seconds: float):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=5)
+        if not self._ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY, model TEXT, prompt TEXT, schema TEXT,
+                    code TEXT, seconds REAL, created REAL, used REAL,
+                    hits INTEGER DEFAULT 0)
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+            conn.commit()
+            self._ready = True
+        return conn
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """Casefold and collapse whitespace outside quotes, drop end punctuation"""
+        parts = re.split(r"('[^']*'|\"[^\"]*\")", prompt.strip())
+        text = "".join(part if i % 2 else re.sub(r"\s+", " ", part.casefold())
+                       for i, part in enumerate(parts))
+        return text.strip().rstrip(" .?!")
+
+    @staticmethod
+    def key(model: str, prompt: str, schema: str) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        for part in (model, ResponseCache.normalize(prompt), schema):
+            h.update(part.encode("utf-8") + b"\0")
+        return h.hexdigest()
+
+    def get(self, model: str, prompt: str, schema: str) -> Optional[str]:
+        key = ResponseCache.key(model, prompt, schema)
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT code, seconds FROM responses WHERE key = ? AND created > ?",
+                    (key, now - self.max_age_seconds)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET used = ?, hits = hits + 1 WHERE key = ?",
+                                 (now, key))
+        except sqlite3.Error:
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += row[1] or 0.0
+        return row[0]
+
+    def put(self, model: str, prompt: str, schema: str, code: str,
+            seconds: float = 0.0) -> bool:
+        """Store code that compiles; returns whether it was stored"""
+        try:
+            compile(code, "<llm>", "exec")
+        except (SyntaxError, ValueError):
+            return False
+
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, model, prompt, schema, code, seconds, created, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (ResponseCache.key(model, prompt, schema), model,
+                     ResponseCache.normalize(prompt), schema, code, seconds, now, now))
+                self._evict(conn, now)
+        except sqlite3.Error:
+            return False
+        return True
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.max_age_seconds,))
+        conn.execute("""
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?)
+        """, (self.max_entries,))
+
+    def clear(self) -> None:
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM responses")
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> Dict:
+        try:
+            with closing(self._connect()) as conn, conn:
+                entries = conn.execute("SELECT count(*) FROM responses").fetchone()[0]
+        except sqlite3.Error:
+            entries = 0
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds
+        }
+
+
+ollama = OllamaClient()
+response_cache = ResponseCache(LLM_CACHE_PATH, LLM_CACHE_ENTRIES,
+                               LLM_CACHE_MAX_AGE_DAYS * 24 * 3600)
@@ -9,11 +9,16 @@ if str(app_dir) not in sys.path:
 
 import streamlit as st
 import pandas as pd
-import numpy as np
 from config import *
 from data_loader import DataLoader
+from cache import dataset_cache
 from analyzer import DataAnalyzer
+from profiler import DataProfiler
+from duplicates import DuplicateDetector
+from outliers import METHODS as OUTLIER_METHODS
+from correlation import CorrelationEngine, METHODS as CORRELATION_METHODS
 from insights import InsightsGenerator
+from rollup import GRAINS as ROLLUP_GRAINS, STATS as ROLLUP_STATS, RollupCube
 
 # Page config
 st.set_page_config(
@@ -99,6 +104,25 @@ st.markdown(f"""
 with st.sidebar:
     st.markdown("### ⚙️ Settings")
     show_advanced = st.checkbox("🔬 Advanced Options", value=False)
+    optimize_memory = st.checkbox(
+        "⚡ Optimize Memory Usage",
+        value=OPTIMIZE_DTYPES,
+        help="Downcast numeric columns and store repeated text as categories after loading"
+    )
+    exact_percentiles = False
+    if show_advanced:
+        exact_percentiles = st.checkbox(
+            "🎯 Exact Percentiles",
+            value=False,
+            help=f"Sort full columns for percentiles even above {EXACT_QUANTILE_MAX_ROWS:,} rows "
+                 f"instead of using quantile sketches"
+        )
+        cache_stats = dataset_cache.stats()
+        st.caption(
+            f"Dataset cache: {cache_stats['entries']} file(s), "
+            f"{cache_stats['size_mb']:.0f} / {cache_stats['budget_mb']:.0f} MB, "
+            f"{cache_stats['hits']} hits"
+        )
     
     st.markdown("---")
     
@@ -189,7 +213,20 @@ if uploaded_file is None:
 # Load data
 try:
     with st.spinner("🔄 Loading and analyzing your data..."):
-        df = DataLoader.load_file(uploaded_file)
+        progress_bar = st.empty()
+        preview_area = st.empty()
+        preview_shown = []
+
+        def show_progress(done, chunk):
+            # Large CSVs arrive in chunks: show the first one while the rest parses
+            progress_bar.progress(done, text=f"Parsing {uploaded_file.name}... {done:.0%}")
+            if not preview_shown:
+                preview_area.dataframe(chunk.head(100), use_container_width=True)
+                preview_shown.append(True)
+
+        df = DataLoader.load_file(uploaded_file, progress=show_progress, optimize=optimize_memory)
+        progress_bar.empty()
+        preview_area.empty()
         st.session_state.df = df
     
     st.success(f"✅ Successfully loaded **{uploaded_file.name}** ({len(df):,} rows × {len(df.columns)} columns)")
@@ -203,13 +240,18 @@ except Exception as e:
 st.markdown("---")
 st.markdown("## 📊 Data Overview")
 
-# Get summary statistics
+# Profile every column once; all views below read from this
 try:
-    summary = DataAnalyzer.get_summary(df)
+    profile = DataProfiler.profile(df, exact_quantiles=exact_percentiles or None)
+    summary = profile.summary()
 except Exception as e:
     st.error(f"Error analyzing data: {e}")
     st.stop()
 
+# Day/week/month/quarter rollups of the datetime columns, built in the background
+if summary['column_types']['datetime']:
+    RollupCube.start(df, summary['column_types']['datetime'], summary['column_types']['numeric'])
+
 # Display metric cards
 col1, col2, col3, col4 = st.columns(4)
 
@@ -230,10 +272,12 @@ with col2:
     """, unsafe_allow_html=True)
 
 with col3:
+    memory_report = DataLoader.memory_report(df) if optimize_memory else None
+    memory_note = f" (was {memory_report['before_mb']:.1f} MB)" if memory_report else ""
     st.markdown(f"""
         <div class="metric-card">
             <h2>{summary['memory_mb']:.1f} MB</h2>
-            <p>Memory Usage</p>
+            <p>Memory Usage{memory_note}</p>
         </div>
     """, unsafe_allow_html=True)
 
@@ -263,7 +307,7 @@ st.markdown("### 🤖 AI-Powered Insights")
 
 with st.spinner("Generating intelligent insights..."):
     insights = InsightsGenerator.generate_insights(df, summary)
-    numeric_insights = InsightsGenerator.generate_numeric_insights(df)
+    numeric_insights = InsightsGenerator.generate_numeric_insights(df, profile)
     all_insights = insights + numeric_insights
 
 # Display insights in a beautiful grid
@@ -278,6 +322,11 @@ for idx, insight in enumerate(all_insights[:6]):  # Show top 6 insights
         else:
             border_color = "#66bb6a"
         
+        link = ""
+        if insight.get('link'):
+            href, label = insight['link']
+            link = f'<a href="{href}" target="_self" style="font-size: 0.9rem;">{label} →</a>'
+        
         st.markdown(f"""
             <div style="
                 border-left: 4px solid {border_color};
@@ -293,6 +342,7 @@ for idx, insight in enumerate(all_insights[:6]):  # Show top 6 insights
                 <p style="margin: 0.5rem 0 0 0; color: #34495e; font-size: 0.9rem;">
                     {insight['description']}
                 </p>
+                {link}
             </div>
         """, unsafe_allow_html=True)
 
@@ -323,6 +373,26 @@ with col3:
             for col in col_types['datetime']:
                 st.text(f"• {col}")
 
+# Trend charts, read from the rollups
+if col_types['datetime']:
+    st.subheader("📈 Time Trends", anchor="time-trends")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        trend_date = st.selectbox("Date column", col_types['datetime'])
+    with col2:
+        trend_grain = st.selectbox("Grain", list(ROLLUP_GRAINS), index=2)
+    with col3:
+        trend_column = st.selectbox("Value", ["(row count)"] + col_types['numeric'])
+    with col4:
+        trend_stat = st.selectbox("Statistic", ROLLUP_STATS, index=1,
+                                  disabled=trend_column == "(row count)")
+    
+    if trend_column == "(row count)":
+        trend_column = None
+    with st.spinner("Aggregating..."):
+        trend = RollupCube.query(df, trend_date, trend_grain, trend_column, trend_stat)
+    st.line_chart(trend, x=trend_date, color=PRIMARY_COLOR, use_container_width=True)
+
 # Data preview
 st.markdown("### 👁️ Data Preview")
 with st.expander("Click to view first 100 rows", expanded=False):
@@ -344,15 +414,13 @@ with st.expander("Click to view first 100 rows", expanded=False):
 
 # Column details
 with st.expander("📊 Detailed Column Information"):
-    col_info = pd.DataFrame({
-        'Column': df.columns,
-        'Type': df.dtypes.astype(str).values,
-        'Non-Null Count': df.count().values,
-        'Null Count': df.isnull().sum().values,
-        'Null %': (df.isnull().sum() / len(df) * 100).round(2).values,
-        'Unique Values': df.nunique().values
-    })
+    col_info = profile.column_info()
     st.dataframe(col_info, use_container_width=True)
+    if profile.approximate_unique:
+        st.caption(
+            f"Unique Values for columns over {APPROX_DISTINCT_MIN_ROWS:,} rows are "
+            f"HyperLogLog estimates (typically within ±{2.08 / 2 ** (HLL_PRECISION / 2):.1%})."
+        )
 
 # Analysis section
 st.markdown("---")
@@ -366,11 +434,39 @@ analysis_type = st.selectbox(
         "🔍 Outlier Detection",
         "📋 Data Types",
         "⚠️ Missing Values Analysis",
+        "🔄 Duplicate Detection",
         "🔗 Correlation Analysis"
     ],
     help="Choose the type of analysis you want to perform"
 )
 
+# Outlier options
+if analysis_type == "🔍 Outlier Detection":
+    col1, col2 = st.columns(2)
+    with col1:
+        outlier_method = st.selectbox(
+            "Detection Method",
+            list(OUTLIER_METHODS),
+            format_func=OUTLIER_METHODS.get
+        )
+    with col2:
+        outlier_threshold = st.number_input(
+            "Threshold",
+            min_value=0.1,
+            value=float(OUTLIER_THRESHOLDS[outlier_method]),
+            step=0.1,
+            key=f"threshold-{outlier_method}",
+            help="Rows scoring above this in any numeric column are flagged"
+        )
+
+# Correlation options
+if analysis_type == "🔗 Correlation Analysis":
+    correlation_method = st.selectbox(
+        "Correlation Method",
+        list(CORRELATION_METHODS),
+        format_func=CORRELATION_METHODS.get
+    )
+
 # Run analysis button
 if st.button("▶️ Run Analysis", type="primary", use_container_width=False):
     with st.spinner("🔄 Analyzing your data..."):
@@ -380,10 +476,10 @@ if st.button("▶️ Run Analysis", type="primary", use_container_width=False):
                 st.markdown("### Statistical Summary")
                 st.write("Descriptive statistics for numeric columns:")
                 
-                numeric_df = df.select_dtypes(include=[np.number])
-                if len(numeric_df.columns) > 0:
-                    stats_df = numeric_df.describe().T
-                    stats_df['variance'] = numeric_df.var()
+                stats_df = profile.numeric_stats()
+                if len(stats_df) > 0:
+                    if not profile.exact_quantiles:
+                        st.caption("Percentiles are estimated from quantile sketches (within about ±1.7% in rank).")
                     stats_df = stats_df.round(2)
                     st.dataframe(stats_df, use_container_width=True)
                     
@@ -399,10 +495,10 @@ if st.button("▶️ Run Analysis", type="primary", use_container_width=False):
                     st.warning("No numeric columns found in the dataset.")
             
             elif analysis_type == "🔍 Outlier Detection":
-                st.markdown("### Outlier Detection (Z-Score Method)")
-                st.write(f"Using threshold: Z-score > {OUTLIER_THRESHOLD}")
+                st.markdown(f"### Outlier Detection ({OUTLIER_METHODS[outlier_method]})")
+                st.write(f"Using threshold: score > {outlier_threshold}")
                 
-                outliers = DataAnalyzer.detect_outliers(df)
+                outliers = DataAnalyzer.detect_outliers(df, outlier_method, outlier_threshold)
                 
                 if len(outliers) > 0:
                     outlier_pct = len(outliers) / len(df) * 100
@@ -425,7 +521,7 @@ if st.button("▶️ Run Analysis", type="primary", use_container_width=False):
             elif analysis_type == "📋 Data Types":
                 st.markdown("### Data Type Classification")
                 
-                types = DataAnalyzer.detect_column_types(df)
+                types = profile.column_types()
                 
                 st.json({
                     "Numeric Columns": types['numeric'],
@@ -445,7 +541,7 @@ if st.button("▶️ Run Analysis", type="primary", use_container_width=False):
             elif analysis_type == "⚠️ Missing Values Analysis":
                 st.markdown("### Missing Values Analysis")
                 
-                missing = df.isnull().sum()
+                missing = profile.missing()
                 missing_df = pd.DataFrame({
                     'Column': missing.index,
                     'Missing Count': missing.values,
@@ -469,32 +565,54 @@ if st.button("▶️ Run Analysis", type="primary", use_container_width=False):
                 else:
                     st.success("✅ No missing values found! Your dataset is complete.")
             
+            elif analysis_type == "🔄 Duplicate Detection":
+                st.markdown("### Duplicate Detection")
+                
+                dup_count = DuplicateDetector.count(df)
+                
+                if dup_count > 0:
+                    st.warning(f"Found **{dup_count:,} duplicate rows** ({dup_count / len(df) * 100:.2f}% of total data)")
+                    
+                    st.markdown("#### Duplicate Groups (Largest 100)")
+                    st.dataframe(DuplicateDetector.groups(df), use_container_width=True)
+                    
+                    # Download deduplicated data (reuses the cached row hashes)
+                    csv_dedup = DuplicateDetector.deduplicate(df).to_csv(index=False).encode('utf-8')
+                    st.download_button(
+                        "📥 Download Deduplicated Dataset",
+                        csv_dedup,
+                        f"{uploaded_file.name.split('.')[0]}_deduplicated.csv",
+                        "text/csv"
+                    )
+                else:
+                    st.success("✅ No duplicate rows found!")
+            
             elif analysis_type == "🔗 Correlation Analysis":
                 st.markdown("### Correlation Analysis")
                 
-                numeric_df = df.select_dtypes(include=[np.number])
+                n_numeric = len(profile.names("numeric"))
                 
-                if len(numeric_df.columns) >= 2:
-                    correlation = numeric_df.corr()
-                    st.write("Correlation matrix for numeric columns:")
-                    st.dataframe(correlation.round(3), use_container_width=True)
-                    
-                    # Find strong correlations
-                    st.markdown("#### Strong Correlations (|r| > 0.7)")
-                    strong_corr = []
-                    for i in range(len(correlation.columns)):
-                        for j in range(i+1, len(correlation.columns)):
-                            if abs(correlation.iloc[i, j]) > 0.7:
-                                strong_corr.append({
-                                    'Variable 1': correlation.columns[i],
-                                    'Variable 2': correlation.columns[j],
-                                    'Correlation': round(correlation.iloc[i, j], 3)
-                                })
+                if n_numeric >= 2:
+                    wide = n_numeric >= CORRELATION_FLOAT32_MIN_COLUMNS
                     
-                    if strong_corr:
-                        st.dataframe(pd.DataFrame(strong_corr), use_container_width=True)
+                    if n_numeric <= CORRELATION_MATRIX_MAX_COLUMNS:
+                        correlation = CorrelationEngine.matrix(df, correlation_method, float32=wide)
+                        st.write("Correlation matrix for numeric columns:")
+                        st.dataframe(correlation.round(3), use_container_width=True)
+                        
+                        # Find strong correlations
+                        st.markdown(f"#### Strong Correlations (|r| > {STRONG_CORRELATION})")
+                        strong_corr = CorrelationEngine.strong_pairs(correlation)
+                        
+                        if len(strong_corr) > 0:
+                            st.dataframe(strong_corr, use_container_width=True)
+                        else:
+                            st.info(f"No strong correlations (|r| > {STRONG_CORRELATION}) found.")
                     else:
-                        st.info("No strong correlations (|r| > 0.7) found.")
+                        # Too wide to display: only keep the strongest pairs
+                        st.markdown(f"#### Top 50 Correlated Pairs ({n_numeric} numeric columns)")
+                        top_corr = CorrelationEngine.top_pairs(df, 50, correlation_method, float32=wide)
+                        st.dataframe(top_corr, use_container_width=True)
                 else:
                     st.warning("Need at least 2 numeric columns for correlation analysis.")
             
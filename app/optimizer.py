@@ -0,0 +1,91 @@
+"""Memory Optimization Module"""
+from typing import Dict, Tuple
+import pandas as pd
+import numpy as np
+from config import MAX_CATEGORIES
+
+# Optional pyarrow import (high-cardinality strings stay as they are without it)
+try:
+    import pyarrow as pa
+except Exception:
+    pa = None
+
+
+class DataOptimizer:
+    """Compact column dtypes after loading"""
+
+    @staticmethod
+    def _downcast_int(col: pd.Series) -> pd.Series:
+        if col.empty:
+            return col
+        lo, hi = col.min(), col.max()
+        candidates = ([np.uint8, np.uint16, np.uint32] if lo >= 0 else []) + \
+            [np.int8, np.int16, np.int32]
+        for dtype in candidates:
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                return col.astype(dtype)
+        return col
+
+    @staticmethod
+    def _downcast_float(col: pd.Series) -> pd.Series:
+        # Only when every value survives the round trip unchanged
+        values = col.to_numpy()
+        small = values.astype(np.float32)
+        with np.errstate(over="ignore", invalid="ignore"):
+            exact = np.array_equal(small.astype(np.float64), values, equal_nan=True)
+        return col.astype(np.float32) if exact else col
+
+    @staticmethod
+    def _compact_strings(col: pd.Series) -> pd.Series:
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            return col
+        if col.nunique(dropna=True) <= MAX_CATEGORIES:
+            return col.astype("category")
+        # Object and python-backed string columns; pandas 3's 'str' is Arrow already
+        if pa is not None and pd.api.types.is_string_dtype(col.dtype) and \
+                getattr(col.dtype, "storage", None) != "pyarrow" and \
+                pd.api.types.infer_dtype(col, skipna=True) == "string":
+            return col.astype(pd.ArrowDtype(pa.string()))
+        return col
+
+    @staticmethod
+    def optimize(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+        """Downcast numerics and compact string columns
+
+        Returns the compacted frame and a report with memory before/after.
+        """
+        before = df.memory_usage(deep=True).sum()
+        columns = []
+
+        for i in range(df.shape[1]):
+            col = df.iloc[:, i]
+            dtype = col.dtype
+
+            if pd.api.types.is_bool_dtype(dtype):
+                columns.append(col)
+            elif isinstance(dtype, np.dtype) and np.issubdtype(dtype, np.integer):
+                columns.append(DataOptimizer._downcast_int(col))
+            elif dtype == np.float64:
+                columns.append(DataOptimizer._downcast_float(col))
+            elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+                columns.append(DataOptimizer._compact_strings(col))
+            else:
+                columns.append(col)
+
+        if columns:
+            optimized = pd.concat(columns, axis=1)
+            optimized.columns = df.columns
+        else:
+            optimized = df
+        after = optimized.memory_usage(deep=True).sum()
+
+        return optimized, {
+            "before_mb": before / (1024 ** 2),
+            "after_mb": after / (1024 ** 2),
+            "changed": {
+                str(name): f"{old} → {new}"
+                for name, old, new in zip(df.columns, df.dtypes, optimized.dtypes)
+                if old != new
+            }
+        }
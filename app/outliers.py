@@ -0,0 +1,117 @@
+"""Outlier Detection Module"""
+from typing import Dict, Tuple
+import pandas as pd
+import numpy as np
+from config import OUTLIER_BLOCK_COLUMNS, OUTLIER_THRESHOLDS, PROFILE_CACHE_ENTRIES
+from cache import LRUCache, dataset_fingerprint
+from profiler import DataProfiler
+
+METHODS = {
+    "zscore": "Z-Score (mean / std)",
+    "modified_zscore": "Modified Z-Score (median / MAD)",
+    "iqr": "IQR Fences (quartiles)"
+}
+
+
+class OutlierDetector:
+    """Scores rows against per-column statistics, one column block at a time
+
+    Statistics are computed once per column and dataset. Scoring keeps only
+    the best score and column per row, so memory is O(rows) rather than
+    O(rows x columns). Missing values are ignored column by column.
+    """
+
+    _mad = LRUCache(PROFILE_CACHE_ENTRIES, lambda mads: 1)
+
+    @staticmethod
+    def _median_abs_deviation(df: pd.DataFrame, name, median: float) -> float:
+        key = f"{dataset_fingerprint(df)}:{name!r}"
+        mad = OutlierDetector._mad.get(key)
+        if mad is None:
+            values = df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+            mad = float(np.nanmedian(np.abs(values - median)))
+            OutlierDetector._mad.put(key, mad)
+        return mad
+
+    @staticmethod
+    def column_stats(df: pd.DataFrame, method: str) -> Dict[str, Tuple[float, float]]:
+        """(center, scale) per numeric column; constant columns are left out
+
+        A row's score in a column is |x - center| / scale, except for IQR
+        where it is the distance outside [Q1, Q3] in units of the IQR.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown outlier method: {method}")
+
+        stats = {}
+        for col in DataProfiler.profile(df).columns:
+            if col.kind != "numeric" or col.count == 0:
+                continue
+
+            if method == "zscore":
+                # Population std, like scipy.stats.zscore
+                center = col.mean
+                scale = np.sqrt(col.var * (col.count - 1) / col.count) if col.count > 1 else 0.0
+            elif method == "modified_zscore":
+                center = col.q50
+                scale = OutlierDetector._median_abs_deviation(df, col.name, col.q50) / 0.6745
+            else:
+                center = (col.q25 + col.q75) / 2
+                scale = col.q75 - col.q25
+
+            if scale > 0 and np.isfinite(scale):
+                stats[col.name] = (center, scale)
+        return stats
+
+    @staticmethod
+    def score(df: pd.DataFrame, method: str = "zscore",
+              stats: Dict[str, Tuple[float, float]] = None) -> pd.DataFrame:
+        """Highest score per row and the column it came from
+
+        `stats` are (center, scale) pairs as from column_stats(), for callers
+        that already have them.
+        """
+        if stats is None:
+            stats = OutlierDetector.column_stats(df, method)
+        names = list(stats)
+        best = np.full(len(df), np.nan)
+        best_col = np.full(len(df), -1, dtype=np.int64)
+
+        for start in range(0, len(names), OUTLIER_BLOCK_COLUMNS):
+            block = names[start:start + OUTLIER_BLOCK_COLUMNS]
+            center = np.array([stats[c][0] for c in block])
+            scale = np.array([stats[c][1] for c in block])
+            values = df[block].to_numpy(dtype=np.float64, na_value=np.nan)
+
+            scores = np.abs(values - center) / scale
+            if method == "iqr":
+                # Distance past the nearer fence base (Q1 or Q3), in IQRs
+                scores = np.maximum(scores - 0.5, 0.0)
+
+            filled = np.where(np.isnan(scores), -np.inf, scores)
+            block_idx = filled.argmax(axis=1)
+            block_best = filled[np.arange(len(df)), block_idx]
+
+            better = block_best > np.where(np.isnan(best), -np.inf, best)
+            best[better] = block_best[better]
+            best_col[better] = block_idx[better] + start
+
+        labels = np.array(names + [None], dtype=object)
+        return pd.DataFrame({
+            "outlier_score": best,
+            "outlier_column": labels[best_col]
+        }, index=df.index)
+
+    @staticmethod
+    def detect(df: pd.DataFrame, method: str = "zscore",
+               threshold: float = None) -> pd.DataFrame:
+        """Rows scoring above the threshold, highest score first"""
+        if threshold is None:
+            threshold = OUTLIER_THRESHOLDS[method]
+
+        scores = OutlierDetector.score(df, method)
+        mask = (scores["outlier_score"] > threshold).to_numpy()
+        outliers = df.loc[mask].copy()
+        outliers["outlier_score"] = scores["outlier_score"].to_numpy()[mask].round(3)
+        outliers["outlier_column"] = scores["outlier_column"].to_numpy()[mask]
+        return outliers.sort_values("outlier_score", ascending=False, kind="stable")
@@ -0,0 +1,121 @@
+"""Aggregated Plotting Module"""
+from typing import Tuple
+import pandas as pd
+import numpy as np
+from config import (HISTOGRAM_BINS, PRIMARY_COLOR, PROFILE_CACHE_ENTRIES,
+                    SCATTER_GRID, SCATTER_MAX_POINTS, STATS_CHUNK_ROWS)
+from cache import LRUCache, dataset_fingerprint
+from sketches import quantile_cache
+
+
+class PlotAggregator:
+    """Histograms and scatter plots drawn from binned counts
+
+    Rows are reduced to a fixed number of bins with NumPy before anything
+    reaches matplotlib, so drawing costs the same for a thousand rows or
+    ten million. Bin edges and counts are cached per dataset and column.
+    """
+
+    _bins = LRUCache(PROFILE_CACHE_ENTRIES * 8, lambda counts: 1)
+
+    @staticmethod
+    def _values(df: pd.DataFrame, name) -> np.ndarray:
+        return df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    @staticmethod
+    def _edges(values: np.ndarray, bins: int) -> np.ndarray:
+        finite = values[np.isfinite(values)]
+        if len(finite) == 0:
+            lo, hi = 0.0, 1.0
+        else:
+            lo, hi = float(finite.min()), float(finite.max())
+        if lo == hi:
+            # Same convention as np.histogram for a constant column
+            lo, hi = lo - 0.5, hi + 0.5
+        return np.linspace(lo, hi, bins + 1)
+
+    @staticmethod
+    def _bin_index(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """Equal-width bin of each value, last bin closed like np.histogram"""
+        bins = len(edges) - 1
+        scaled = (values - edges[0]) * (bins / (edges[-1] - edges[0]))
+        return np.clip(scaled.astype(np.int64), 0, bins - 1)
+
+    @staticmethod
+    def histogram_counts(df: pd.DataFrame, name,
+                         bins: int = HISTOGRAM_BINS) -> Tuple[np.ndarray, np.ndarray]:
+        """(counts, edges) over the column's finite values"""
+        key = f"{dataset_fingerprint(df)}:hist:{name!r}:{bins}"
+        cached = PlotAggregator._bins.get(key)
+        if cached is not None:
+            return cached
+
+        values = PlotAggregator._values(df, name)
+        # The profiling sketch knows the exact min / max; without one, scan for them
+        sketch = (quantile_cache.get(dataset_fingerprint(df)) or {}).get(name)
+        if sketch is not None and np.isfinite([sketch.min, sketch.max]).all():
+            edges = sketch.bin_edges(bins)
+        else:
+            edges = PlotAggregator._edges(values, bins)
+        counts = np.zeros(bins, dtype=np.int64)
+        for start in range(0, len(values), STATS_CHUNK_ROWS):
+            chunk = values[start:start + STATS_CHUNK_ROWS]
+            chunk = chunk[np.isfinite(chunk)]
+            counts += np.bincount(PlotAggregator._bin_index(chunk, edges), minlength=bins)
+
+        PlotAggregator._bins.put(key, (counts, edges))
+        return counts, edges
+
+    @staticmethod
+    def density_grid(df: pd.DataFrame, x, y,
+                     grid: int = SCATTER_GRID) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(counts[x_bin, y_bin], x_edges, y_edges) over rows with both values"""
+        key = f"{dataset_fingerprint(df)}:grid:{x!r}:{y!r}:{grid}"
+        cached = PlotAggregator._bins.get(key)
+        if cached is not None:
+            return cached
+
+        xs, ys = PlotAggregator._values(df, x), PlotAggregator._values(df, y)
+        x_edges, y_edges = PlotAggregator._edges(xs, grid), PlotAggregator._edges(ys, grid)
+        counts = np.zeros(grid * grid, dtype=np.int64)
+        for start in range(0, len(xs), STATS_CHUNK_ROWS):
+            cx, cy = xs[start:start + STATS_CHUNK_ROWS], ys[start:start + STATS_CHUNK_ROWS]
+            keep = np.isfinite(cx) & np.isfinite(cy)
+            cells = (PlotAggregator._bin_index(cx[keep], x_edges) * grid
+                     + PlotAggregator._bin_index(cy[keep], y_edges))
+            counts += np.bincount(cells, minlength=grid * grid)
+
+        result = (counts.reshape(grid, grid), x_edges, y_edges)
+        PlotAggregator._bins.put(key, result)
+        return result
+
+    @staticmethod
+    def histogram(df: pd.DataFrame, name, bins: int = HISTOGRAM_BINS, ax=None):
+        """Draw a histogram of one numeric column"""
+        import matplotlib.pyplot as plt
+        ax = ax or plt.gca()
+        counts, edges = PlotAggregator.histogram_counts(df, name, bins)
+        ax.stairs(counts, edges, fill=True, color=PRIMARY_COLOR)
+        ax.grid(True)
+        return ax
+
+    @staticmethod
+    def scatter(df: pd.DataFrame, x, y, max_points: int = SCATTER_MAX_POINTS,
+                grid: int = SCATTER_GRID, ax=None):
+        """Draw y against x: points when small, a density heatmap when large"""
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import LogNorm
+        ax = ax or plt.gca()
+
+        if len(df) <= max_points:
+            ax.scatter(PlotAggregator._values(df, x), PlotAggregator._values(df, y),
+                       s=8, color=PRIMARY_COLOR)
+        else:
+            counts, x_edges, y_edges = PlotAggregator.density_grid(df, x, y, grid)
+            if counts.any():
+                masked = np.ma.masked_equal(counts.T, 0)
+                mesh = ax.pcolormesh(x_edges, y_edges, masked, norm=LogNorm(), cmap="viridis")
+                ax.figure.colorbar(mesh, ax=ax, label="rows")
+        ax.set_xlabel(str(x))
+        ax.set_ylabel(str(y))
+        return ax
@@ -0,0 +1,117 @@
+"""Background Precomputation Module"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+import pandas as pd
+from config import PRECOMPUTE_WORKERS
+from cache import dataset_fingerprint
+
+
+class Precomputer:
+    """Runs the suggested analyses of a dataset before anyone asks for them
+
+    Jobs are submitted cheapest first to a small thread pool; each one goes
+    through `run(df, prompt, cancel)`, which stores its result in the
+    shared result cache, so clicking a finished suggestion is instant.
+    With a `batch(df, prompts, cancel, on_result)` runner, the prompts
+    scheduled together go in one job so they can share their reads of the
+    data; every prompt still has its own future, resolved as soon as the
+    batch hands over its result, and the prompts the batch can't answer
+    are queued as single jobs. Starting on another dataset cancels
+    whatever is still pending or running for the previous one.
+    """
+
+    def __init__(self, run: Callable, cost: Callable[[str], float] = None,
+                 batch: Callable = None, workers: int = PRECOMPUTE_WORKERS):
+        self._run = run
+        self._batch = batch
+        self._cost = cost or (lambda prompt: 0)
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1),
+                                            thread_name_prefix="precompute")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Future] = {}
+        self._claimed = set()  # dropped by claim(): the caller ran them
+        self._cancel = threading.Event()
+        self.fingerprint: Optional[str] = None
+
+    def start(self, df: pd.DataFrame, prompts: Iterable[str]) -> None:
+        """Schedule the prompts for this dataset; no-op if already scheduled"""
+        fingerprint = dataset_fingerprint(df)
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self._cancel_jobs()
+                self.fingerprint = fingerprint
+                self._cancel = threading.Event()
+
+            new = sorted((p for p in dict.fromkeys(prompts)
+                          if p not in self._jobs and p not in self._claimed), key=self._cost)
+            if self._batch is not None and new:
+                # Placeholders, resolved by the batch job one prompt at a time
+                futures = {prompt: Future() for prompt in new}
+                self._jobs.update(futures)
+                self._executor.submit(self._run_batch, df, futures, self._cancel)
+                return
+            for prompt in new:
+                self._jobs[prompt] = self._executor.submit(self._run, df, prompt, self._cancel)
+
+    def _run_batch(self, df: pd.DataFrame, futures: Dict[str, Future],
+                   cancel: threading.Event) -> None:
+        # Prompts claimed (cancelled) before the batch started are left out
+        live = {p: f for p, f in futures.items() if f.set_running_or_notify_cancel()}
+        try:
+            self._batch(df, list(live), cancel, lambda p, result: live[p].set_result(result))
+        except Exception:
+            pass  # whatever it didn't answer runs on its own below
+
+        for prompt, placeholder in live.items():
+            if placeholder.done():
+                continue
+            with self._lock:
+                if cancel.is_set() or self._jobs.get(prompt) is not placeholder:
+                    placeholder.set_result(None)
+                    continue
+                # On its own from here on, so a claim can still drop it
+                job = self._executor.submit(self._run, df, prompt, cancel)
+                self._jobs[prompt] = job
+            job.add_done_callback(lambda j, f=placeholder: f.set_result(
+                None if j.cancelled() or j.exception() is not None else j.result()))
+
+    def _cancel_jobs(self) -> None:
+        self._cancel.set()
+        for future in self._jobs.values():
+            future.cancel()
+        self._jobs = {}
+        self._claimed = set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancel_jobs()
+            self.fingerprint = None
+
+    def claim(self, df: pd.DataFrame, prompt: str, timeout: float = None) -> Optional[Dict]:
+        """The result for a prompt if it's done or running, waiting for it;
+        None if it was never scheduled or hadn't started (it's dropped)."""
+        with self._lock:
+            future = self._jobs.get(prompt)
+            if future is None or dataset_fingerprint(df) != self.fingerprint:
+                return None
+            # A job that hasn't started is dropped; the caller runs it now
+            if future.cancel():
+                del self._jobs[prompt]
+                self._claimed.add(prompt)
+                return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            # Cancelled, timed out or failed: the caller runs it itself
+            return None
+
+    def status(self) -> Dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        done = sum(f.done() for f in jobs)
+        return {"done": done, "pending": len(jobs) - done}
+
+    def shutdown(self) -> None:
+        self.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,247 @@
+"""Data Profiling Module"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+import numpy as np
+from config import (MAX_CATEGORIES, PROFILE_CACHE_ENTRIES, APPROX_DISTINCT_MIN_ROWS,
+                    EXACT_QUANTILE_MAX_ROWS, STATS_CHUNK_ROWS)
+from cache import LRUCache, dataset_fingerprint
+from sketches import (HyperLogLog, KLLSketch, exceeds_distinct, quantile_cache,
+                      sketch_cache)
+from duplicates import DuplicateDetector
+from running_stats import RunningStats
+from groups import GroupIndex
+
+
+@dataclass(frozen=True)
+class ColumnProfile:
+    """Statistics for one column, computed in a single pass"""
+    name: str
+    dtype: str
+    kind: str  # "numeric", "datetime", "categorical" or "other"
+    count: int
+    nulls: int
+    unique: int
+    memory_bytes: int
+    unique_exact: bool = True  # False when `unique` is a HyperLogLog estimate
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    var: Optional[float] = None
+    min: Optional[float] = None
+    q25: Optional[float] = None
+    q50: Optional[float] = None
+    q75: Optional[float] = None
+    max: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class DataProfile:
+    """Immutable profile of a dataset, shared by every view of the page"""
+    fingerprint: str
+    rows: int
+    columns: Tuple[ColumnProfile, ...]
+    memory_bytes: int
+    duplicates: int
+    exact_quantiles: bool = True  # False when quartiles come from KLL sketches
+
+    @property
+    def memory_mb(self) -> float:
+        return self.memory_bytes / (1024 ** 2)
+
+    @property
+    def missing_total(self) -> int:
+        return sum(c.nulls for c in self.columns)
+
+    @property
+    def approximate_unique(self) -> bool:
+        return not all(c.unique_exact for c in self.columns)
+
+    def column(self, name) -> ColumnProfile:
+        for col in self.columns:
+            if col.name == name:
+                return col
+        raise KeyError(name)
+
+    def names(self, kind: str) -> List:
+        return [c.name for c in self.columns if c.kind == kind]
+
+    def column_types(self) -> Dict[str, List[str]]:
+        return {
+            "numeric": self.names("numeric"),
+            "categorical": self.names("categorical"),
+            "datetime": self.names("datetime")
+        }
+
+    def summary(self) -> Dict:
+        """Same shape as DataAnalyzer.get_summary"""
+        return {
+            "shape": {"rows": self.rows, "columns": len(self.columns)},
+            "memory_mb": self.memory_mb,
+            "column_types": self.column_types(),
+            "missing_total": self.missing_total,
+            "duplicates": self.duplicates
+        }
+
+    def missing(self) -> pd.Series:
+        return pd.Series([c.nulls for c in self.columns],
+                         index=[c.name for c in self.columns], dtype="int64")
+
+    def column_info(self) -> pd.DataFrame:
+        rows = max(self.rows, 1)
+        return pd.DataFrame({
+            'Column': [c.name for c in self.columns],
+            'Type': [c.dtype for c in self.columns],
+            'Non-Null Count': [c.count for c in self.columns],
+            'Null Count': [c.nulls for c in self.columns],
+            'Null %': [round(c.nulls / rows * 100, 2) for c in self.columns],
+            'Unique Values': [c.unique for c in self.columns]
+        })
+
+    def numeric_stats(self) -> pd.DataFrame:
+        """describe()-style table for numeric columns, plus variance"""
+        cols = [c for c in self.columns if c.kind == "numeric"]
+        return pd.DataFrame(
+            [[c.count, c.mean, c.std, c.min, c.q25, c.q50, c.q75, c.max, c.var] for c in cols],
+            index=[c.name for c in cols],
+            columns=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max', 'variance']
+        )
+
+
+class DataProfiler:
+    """Builds and caches dataset profiles"""
+
+    _cache = LRUCache(PROFILE_CACHE_ENTRIES, lambda profile: 1)
+
+    @staticmethod
+    def _distinct(col: pd.Series, low_cardinality: bool,
+                  sketch: HyperLogLog = None) -> Tuple[int, bool]:
+        """Exact distinct count for small or low-cardinality columns, else an estimate"""
+        if low_cardinality or len(col) < APPROX_DISTINCT_MIN_ROWS:
+            return int(col.nunique(dropna=True)), True
+        if sketch is None:
+            sketch = HyperLogLog().update(col)
+        return sketch.estimate(), False
+
+    @staticmethod
+    def _profile_column(name, col: pd.Series, sketch: HyperLogLog = None,
+                        moments: Dict = None,
+                        quantiles: KLLSketch = None,
+                        groups: Callable[[], GroupIndex] = None) -> ColumnProfile:
+        dtype = col.dtype
+        nulls = int(col.isna().sum())
+        count = len(col) - nulls
+        memory = int(col.memory_usage(deep=True, index=False))
+
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            kind = "numeric"
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            kind = "datetime"
+        elif not exceeds_distinct(col, MAX_CATEGORIES):
+            kind = "categorical"
+        else:
+            kind = "other"
+
+        if kind == "categorical" and groups is not None:
+            # Factorized once here; top-k counts and group-bys reuse the codes
+            unique, exact = groups().distinct, True
+        else:
+            unique, exact = DataProfiler._distinct(col, kind == "categorical", sketch)
+        profile = dict(name=name, dtype=str(dtype), kind=kind, count=count,
+                       nulls=nulls, unique=unique, unique_exact=exact,
+                       memory_bytes=memory)
+
+        if kind == "numeric" and count > 0:
+            if quantiles is not None:
+                q25, q50, q75 = quantiles.quantiles([0.25, 0.5, 0.75])
+            else:
+                values = col.to_numpy(dtype=np.float64, na_value=np.nan)
+                q25, q50, q75 = np.quantile(values[~np.isnan(values)], [0.25, 0.5, 0.75])
+            profile.update(moments)
+            profile.update(q25=float(q25), q50=float(q50), q75=float(q75))
+
+        return ColumnProfile(**profile)
+
+    @staticmethod
+    def moments(stats: RunningStats, positions: List[int]) -> Dict[int, Dict]:
+        """ColumnProfile fields from an accumulator, by column position"""
+        frame = stats.to_frame()
+        return {
+            pos: dict(mean=float(frame['mean'].iloc[k]), std=float(frame['std'].iloc[k]),
+                      var=float(frame['variance'].iloc[k]), min=float(frame['min'].iloc[k]),
+                      max=float(frame['max'].iloc[k]))
+            for k, pos in enumerate(positions)
+        }
+
+    @staticmethod
+    def _numeric_pass(df: pd.DataFrame, numeric: List[int],
+                      exact: bool) -> Tuple[Dict[int, Dict], Dict[int, KLLSketch]]:
+        """Moments (and quantile sketches) for the numeric columns, one row chunk at a time"""
+        stats = RunningStats([df.columns[i] for i in numeric])
+        sketches = {} if exact else {pos: KLLSketch() for pos in numeric}
+
+        if numeric:
+            for start in range(0, len(df), STATS_CHUNK_ROWS):
+                block = df.iloc[start:start + STATS_CHUNK_ROWS, numeric].to_numpy(
+                    dtype=np.float64, na_value=np.nan)
+                stats.update(block)
+                for k, pos in enumerate(sketches):
+                    sketches[pos].update(block[:, k])
+
+        return DataProfiler.moments(stats, numeric), sketches
+
+    @staticmethod
+    def profile(df: pd.DataFrame, exact_quantiles: bool = None) -> DataProfile:
+        """Profile every column once; repeated calls reuse the cached result
+
+        Quartiles are exact up to EXACT_QUANTILE_MAX_ROWS rows and come from
+        KLL sketches above that, unless `exact_quantiles` says otherwise.
+        """
+        if exact_quantiles is None:
+            exact_quantiles = len(df) <= EXACT_QUANTILE_MAX_ROWS
+        fingerprint = dataset_fingerprint(df)
+        key = f"{fingerprint}:{'exact' if exact_quantiles else 'sketch'}"
+        cached = DataProfiler._cache.get(key)
+        if cached is not None:
+            return cached
+
+        numeric = [i for i in range(df.shape[1])
+                   if pd.api.types.is_numeric_dtype(df.dtypes.iloc[i])
+                   and not pd.api.types.is_bool_dtype(df.dtypes.iloc[i])]
+        moments, quantiles = DataProfiler._numeric_pass(df, numeric, exact_quantiles)
+        if quantiles:
+            quantile_cache.put(fingerprint, {df.columns[i]: q for i, q in quantiles.items()})
+
+        # Sketches built while the file streamed in save re-hashing big columns
+        sketches = sketch_cache.get(fingerprint) or {}
+        columns = tuple(
+            DataProfiler._profile_column(
+                name, df.iloc[:, i], sketches.get(name), moments.get(i), quantiles.get(i),
+                lambda name=name, i=i: GroupIndex.build(df, name, df.iloc[:, i]))
+            for i, name in enumerate(df.columns)
+        )
+        profile = DataProfile(
+            fingerprint=fingerprint,
+            rows=len(df),
+            columns=columns,
+            memory_bytes=int(df.index.memory_usage(deep=True)) +
+                sum(c.memory_bytes for c in columns),
+            duplicates=DuplicateDetector.count(df),
+            exact_quantiles=exact_quantiles
+        )
+        DataProfiler._cache.put(key, profile)
+        return profile
+
+    @staticmethod
+    def cached(df: pd.DataFrame) -> Optional[DataProfile]:
+        """The profile of this dataset if one was already computed, else None"""
+        fingerprint = dataset_fingerprint(df)
+        return (DataProfiler._cache.get(f"{fingerprint}:exact")
+                or DataProfiler._cache.get(f"{fingerprint}:sketch"))
+
+    @staticmethod
+    def quantile_sketch(df: pd.DataFrame, name) -> KLLSketch:
+        """The profiling sketch for a numeric column, or a new one built in one pass"""
+        sketches = quantile_cache.get(dataset_fingerprint(df)) or {}
+        if name in sketches:
+            return sketches[name]
+        return KLLSketch().update(df[name].to_numpy(dtype=np.float64, na_value=np.nan))
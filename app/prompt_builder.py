@@ -0,0 +1,144 @@
+"""LLM Prompt Builder Module"""
+import re
+from typing import Dict, List, Tuple
+import pandas as pd
+import numpy as np
+from config import LLM_EXAMPLE_VALUES, LLM_PROMPT_TOKENS, LLM_VALUE_CHARS
+from profiler import ColumnProfile, DataProfiler
+
+SYSTEM_PROMPT = (
+    "You are a helpful data analyst and will respond with Python code only.\n"
+    "You must return code inside a ```python ... ``` block. The DataFrame is named `df`.\n"
+    "Use pandas for data manipulation and matplotlib for charts. Do not import heavy libs.\n"
+    "If returning a chart, produce matplotlib code that draws the figure (no show()) and nothing else.\n"
+    "For large data prefer plot_histogram(df, col) and plot_scatter(df, x, y), which are predefined.\n"
+    "For trends over time use rollup(df, date_col, grain, value_col, stat), also predefined: grain is\n"
+    "'day', 'week', 'month' or 'quarter', stat 'count', 'sum', 'min' or 'max'; it returns a DataFrame.\n"
+    "For category counts and group-bys prefer top_counts(df, col, k) and group_agg(df, key, value_col, stat)\n"
+    "with stat 'count', 'sum' or 'mean', also predefined.\n"
+    "Put a table answer in a DataFrame named `result`.\n"
+)
+
+# Rough size of a token for English text and code; no tokenizer is needed
+CHARS_PER_TOKEN = 4
+# Room kept for the "Other columns" prefix and the "... more columns" note
+OVERFLOW_TOKENS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class PromptBuilder:
+    """Prompts that describe the dataset within a per-model token budget
+
+    Columns named in the question come first. Every column's name and
+    dtype goes in while the budget allows, then the leading columns are
+    upgraded to a detail line (cardinality, missing values, range or
+    example values). Columns that don't fit are only counted, so wide
+    tables never overflow the model's context.
+    """
+
+    @staticmethod
+    def budget(model: str) -> int:
+        """Token cap for a model, matched on its name without the tag"""
+        family = model.split(":")[0].lower()
+        for name in (model.lower(), family):
+            if name in LLM_PROMPT_TOKENS:
+                return LLM_PROMPT_TOKENS[name]
+        return LLM_PROMPT_TOKENS["default"]
+
+    @staticmethod
+    def _short(value) -> str:
+        text = str(value)
+        return text if len(text) <= LLM_VALUE_CHARS else text[:LLM_VALUE_CHARS - 1] + "…"
+
+    @staticmethod
+    def _number(value) -> str:
+        return f"{value:.6g}" if isinstance(value, (float, np.floating)) else str(value)
+
+    @staticmethod
+    def _examples(col: pd.Series) -> List[str]:
+        values = pd.unique(col.iloc[:1000].dropna())[:LLM_EXAMPLE_VALUES]
+        return [repr(PromptBuilder._short(v)) for v in values]
+
+    @staticmethod
+    def describe_column(df: pd.DataFrame, col: ColumnProfile) -> str:
+        unique = f"~{col.unique:,}" if not col.unique_exact else f"{col.unique:,}"
+        parts = [f"{col.dtype}", f"{unique} distinct"]
+        if col.nulls:
+            parts.append(f"{col.nulls:,} missing")
+        if col.kind == "numeric" and col.count:
+            parts.append(f"range {PromptBuilder._number(col.min)}..{PromptBuilder._number(col.max)}")
+        else:
+            examples = PromptBuilder._examples(df[col.name])
+            if examples:
+                parts.append("e.g. " + ", ".join(examples))
+        return f"- {col.name!r}: " + ", ".join(parts)
+
+    @staticmethod
+    def _mentioned(columns: List[ColumnProfile], question: str) -> List[ColumnProfile]:
+        """Columns whose name appears as a whole word in the question"""
+        q = question.lower()
+        return [c for c in columns
+                if re.search(rf"(?<!\w){re.escape(str(c.name).lower())}(?!\w)", q)]
+
+    @staticmethod
+    def build(df: pd.DataFrame, question: str, model: str) -> Tuple[str, Dict]:
+        """The prompt text and a report of its size and what it covers"""
+        profile = DataProfiler.profile(df)
+        budget = PromptBuilder.budget(model)
+
+        head = SYSTEM_PROMPT + f"\n# Dataset: {profile.rows:,} rows, {len(profile.columns)} columns\n"
+        tail = "\n# User prompt: " + question
+        used = estimate_tokens(head + tail)
+        budget_left = budget - OVERFLOW_TOKENS
+
+        # Columns the question names get a detail line up front; then every
+        # other name (they're what the model gets wrong), then detail lines
+        # for those in table order while the budget allows
+        columns = list(profile.columns)
+        detailed, entries, described = [], [], set()
+        for col in PromptBuilder._mentioned(columns, question):
+            line = PromptBuilder.describe_column(df, col) + "\n"
+            cost = estimate_tokens(line)
+            if used + cost <= budget_left:
+                detailed.append(line)
+                described.add(id(col))
+                used += cost
+
+        for col in columns:
+            if id(col) in described:
+                continue
+            entry = f"{col.name!r} ({col.dtype}), "
+            cost = estimate_tokens(entry)
+            if used + cost > budget_left:
+                break
+            entries.append((col, entry, cost))
+            used += cost
+
+        listed = []
+        for col, entry, cost in entries:
+            line = PromptBuilder.describe_column(df, col) + "\n"
+            extra = estimate_tokens(line) - cost
+            if not listed and used + extra <= budget_left:
+                detailed.append(line)
+                used += extra
+            else:
+                listed.append(entry)
+
+        body = "".join(detailed)
+        if listed:
+            body += "- Other columns: " + "".join(listed).rstrip(", ") + "\n"
+        omitted = len(columns) - len(detailed) - len(listed)
+        if omitted:
+            body += f"- ... and {omitted} more columns not shown\n"
+
+        prompt = head + body + tail
+        return prompt, {
+            "tokens": estimate_tokens(prompt),
+            "budget": budget,
+            "detailed": len(detailed),
+            "listed": len(listed),
+            "omitted": omitted
+        }
@@ -0,0 +1,180 @@
+"""Time Rollup Module"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+import pandas as pd
+import numpy as np
+from config import ROLLUP_CACHE_MB, ROLLUP_WORKERS
+from cache import LRUCache, dataset_fingerprint
+from time_index import MONTH_END, QUARTER_END, TimeIndex
+
+# Grains of the cube, finest first; each one is a union of days
+GRAINS = {"day": "D", "week": "W", "month": MONTH_END, "quarter": QUARTER_END}
+STATS = ("count", "sum", "min", "max")
+
+# How each statistic of a coarser bin combines the daily ones
+_COMBINE = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+class RollupCube:
+    """count / sum / min / max of numeric columns per day, week, month and quarter
+
+    One cube per dataset and datetime column. Daily bins come from one
+    pass over the cached TimeIndex; weeks, months and quarters are rolled
+    up from the days, so every grain costs a few thousand rows. Columns
+    are added on demand and kept, so a cube built in the background
+    answers trend questions at any grain without touching the data again.
+    """
+
+    _cache = LRUCache(ROLLUP_CACHE_MB * 1024 ** 2, lambda cube: cube.nbytes)
+    _executor: Optional[ThreadPoolExecutor] = None
+    _pending: Dict[str, Future] = {}
+    _lock = threading.RLock()  # a build that's already done calls back into start()
+
+    def __init__(self, name):
+        self.name = name
+        self.rows: Dict[str, pd.Series] = {}
+        self.tables: Dict = {}  # column -> grain -> DataFrame of STATS
+        self.dtypes: Dict = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        tables = [t for grains in self.tables.values() for t in grains.values()]
+        return sum(int(t.memory_usage().sum()) for t in tables) + \
+            sum(int(s.memory_usage()) for s in self.rows.values())
+
+    @staticmethod
+    def _roll_up(daily: pd.DataFrame, combine: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+        tables = {"day": daily}
+        for grain, freq in GRAINS.items():
+            if grain != "day":
+                tables[grain] = daily.resample(freq).agg(combine)
+        return tables
+
+    @staticmethod
+    def summable(df: pd.DataFrame, column) -> bool:
+        dtype = df[column].dtype
+        return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) \
+            and not pd.api.types.is_complex_dtype(dtype)
+
+    def add(self, df: pd.DataFrame, columns: Iterable = ()) -> "RollupCube":
+        """Aggregate the numeric columns not in the cube yet"""
+        index = TimeIndex.get(df, self.name)
+        with self._lock:
+            if not self.rows:
+                daily = index.resample("D").rename("rows").to_frame()
+                self.rows = {g: t["rows"] for g, t in
+                             RollupCube._roll_up(daily, {"rows": "sum"}).items()}
+            for column in columns:
+                if column in self.tables or not RollupCube.summable(df, column):
+                    continue
+                col = df[column]
+                values = col.to_numpy() if isinstance(col.dtype, np.dtype) \
+                    else col.to_numpy(dtype=np.float64, na_value=np.nan)
+                self.tables[column] = RollupCube._roll_up(index.aggregate("D", values), _COMBINE)
+                self.dtypes[column] = col.dtype
+        return self
+
+    def series(self, grain: str = "month", column=None, stat: str = "sum") -> pd.Series:
+        """One statistic per bin; the row count per bin without a column"""
+        if grain not in GRAINS:
+            raise ValueError(f"Unknown grain: {grain} (use one of {', '.join(GRAINS)})")
+        if column is None:
+            return self.rows[grain].rename("count")
+        if stat not in STATS:
+            raise ValueError(f"Unknown statistic: {stat} (use one of {', '.join(STATS)})")
+        values = self.tables[column][grain][stat]
+        dtype = self.dtypes[column]
+        if stat == "sum":
+            # Integer sums stay 64-bit (narrow columns would overflow);
+            # nullable ones were summed as float64
+            if pd.api.types.is_integer_dtype(dtype):
+                if not isinstance(dtype, np.dtype):
+                    values = values.astype("UInt64" if pd.api.types.is_unsigned_integer_dtype(dtype)
+                                           else "Int64")
+            else:
+                values = values.astype(dtype, copy=False)
+        elif stat in ("min", "max"):
+            # Back to the column's dtype, unless empty bins hold NaN in an int column
+            if not (isinstance(dtype, np.dtype) and dtype.kind in "iu" and values.isna().any()):
+                values = values.astype(dtype, copy=False)
+        return values.rename(column)
+
+    @staticmethod
+    def _key(df: pd.DataFrame, name) -> str:
+        return f"{dataset_fingerprint(df)}:{name!r}"
+
+    @staticmethod
+    def get(df: pd.DataFrame, name, columns: Iterable = (), wait: bool = False) -> Optional["RollupCube"]:
+        """The cube for df[name] with `columns` in it; None if it isn't built
+        yet, unless `wait`, which waits for a background build or builds it."""
+        key = RollupCube._key(df, name)
+        columns = list(columns)
+        cube = RollupCube._cache.get(key)
+        if cube is not None and all(c in cube.tables or not RollupCube.summable(df, c)
+                                    for c in columns):
+            return cube
+        if not wait:
+            return None
+
+        with RollupCube._lock:
+            pending = RollupCube._pending.get(key)
+        if pending is not None:
+            try:
+                pending.result()
+            except Exception:
+                pass
+        return RollupCube.build(df, name, columns)
+
+    @staticmethod
+    def build(df: pd.DataFrame, name, columns: Iterable = ()) -> "RollupCube":
+        """Add `columns` to the cube for df[name], creating it if needed"""
+        key = RollupCube._key(df, name)
+        cube = RollupCube._cache.get(key) or RollupCube(name)
+        cube.add(df, columns)
+        # Put again: the cache accounts for the cube's new size
+        RollupCube._cache.put(key, cube)
+        return cube
+
+    @staticmethod
+    def start(df: pd.DataFrame, names: Iterable, columns: Iterable) -> None:
+        """Build the cubes of the datetime columns `names` in the background"""
+        columns = list(columns)
+        with RollupCube._lock:
+            if RollupCube._executor is None:
+                RollupCube._executor = ThreadPoolExecutor(max_workers=max(ROLLUP_WORKERS, 1),
+                                                          thread_name_prefix="rollup")
+            for name in names:
+                key = RollupCube._key(df, name)
+                pending = RollupCube._pending.get(key)
+                if (pending is not None and not pending.done()) or \
+                        RollupCube.get(df, name, columns) is not None:
+                    continue
+                future = RollupCube._executor.submit(RollupCube.build, df, name, columns)
+                RollupCube._pending[key] = future
+                future.add_done_callback(lambda f, key=key: RollupCube._forget(key, f))
+
+    @staticmethod
+    def _forget(key: str, future: Future) -> None:
+        with RollupCube._lock:
+            if RollupCube._pending.get(key) is future:
+                del RollupCube._pending[key]
+
+    @staticmethod
+    def query(df: pd.DataFrame, name, grain: str = "month", column=None,
+              stat: str = "sum") -> pd.DataFrame:
+        """`stat` of df[column] (row count without a column) per `grain` of df[name]
+
+        Returns the bin labels and the values, like
+        df.set_index(name).resample(...)[column].agg(stat).reset_index().
+        Answered from the rollup cube, which is built on first use.
+        """
+        if column is not None and not RollupCube.summable(df, column):
+            # Not aggregable in the cube (e.g. text); resample it directly
+            if stat != "sum" or grain not in GRAINS:
+                raise ValueError(f"Column {column!r} is not numeric")
+            return TimeIndex.resample_frame(df, name, GRAINS[grain], column)
+
+        cube = RollupCube.get(df, name, [] if column is None else [column], wait=True)
+        return cube.series(grain, column, stat).rename_axis(name).reset_index()
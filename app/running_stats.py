@@ -0,0 +1,100 @@
+"""Streaming Statistics Module"""
+from typing import Iterable, Sequence
+import pandas as pd
+import numpy as np
+from config import STATS_CHUNK_ROWS
+
+
+class RunningStats:
+    """One-pass, mergeable count / mean / variance / min / max per column
+
+    Each chunk is reduced with a two-pass mean and sum of squared
+    deviations, then folded into the running totals with Chan et al.'s
+    pairwise update (the batched form of Welford's algorithm). Merging two
+    accumulators uses the same update, so chunks can be summarized in any
+    order, in other threads or in other processes. Missing values are
+    skipped per column.
+    """
+
+    def __init__(self, columns: Sequence):
+        k = len(columns)
+        self.columns = list(columns)
+        self.count = np.zeros(k, dtype=np.int64)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def _combine(self, count, mean, m2, lo, hi) -> None:
+        total = self.count + count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(total > 0, count / total, 0.0)
+        delta = np.where(count > 0, mean - self.mean, 0.0)
+
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + np.where(count > 0, m2, 0.0) + delta ** 2 * self.count * weight
+        self.count = total
+        self.min = np.fmin(self.min, lo)
+        self.max = np.fmax(self.max, hi)
+
+    def update(self, chunk) -> "RunningStats":
+        """Fold in a chunk of rows (DataFrame or 2-D array, same columns)"""
+        if isinstance(chunk, pd.DataFrame):
+            chunk = chunk.to_numpy(dtype=np.float64, na_value=np.nan)
+        values = np.asarray(chunk, dtype=np.float64)
+        if values.size == 0:
+            return self
+        values = values.reshape(-1, len(self.columns))
+
+        present = ~np.isnan(values)
+        count = present.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.nansum(values, axis=0) / count
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+        lo = np.fmin.reduce(values, axis=0, initial=np.inf)
+        hi = np.fmax.reduce(values, axis=0, initial=-np.inf)
+
+        self._combine(count, mean, m2, lo, hi)
+        return self
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge statistics for different columns")
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    @property
+    def variance(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def to_frame(self) -> pd.DataFrame:
+        empty = self.count == 0
+        return pd.DataFrame({
+            'count': self.count,
+            'mean': np.where(empty, np.nan, self.mean),
+            'std': self.std,
+            'min': np.where(empty, np.nan, self.min),
+            'max': np.where(empty, np.nan, self.max),
+            'variance': self.variance
+        }, index=self.columns)
+
+    @classmethod
+    def from_chunks(cls, columns: Sequence, chunks: Iterable) -> "RunningStats":
+        stats = cls(columns)
+        for chunk in chunks:
+            stats.update(chunk)
+        return stats
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame,
+                   chunk_rows: int = STATS_CHUNK_ROWS) -> "RunningStats":
+        """Summarize a frame STATS_CHUNK_ROWS rows at a time"""
+        return cls.from_chunks(
+            df.columns,
+            (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+        )
@@ -0,0 +1,400 @@
+"""Sandboxed Code Execution Module"""
+import atexit
+import contextlib
+import hashlib
+import io
+import multiprocessing as mp
+import pickle
+import queue
+import threading
+import time
+from typing import Dict, Optional
+import pandas as pd
+import numpy as np
+from config import (CHART_DPI, RESULT_CACHE_MB, SANDBOX_MEMORY_MB, SANDBOX_TIMEOUT_S,
+                    SANDBOX_WORKERS)
+from cache import (LRUCache, dataset_fingerprint, disk_cache, frame_nbytes,
+                   register_fingerprint)
+
+# Optional resource import (memory limits are POSIX only)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Runs ending with these statuses leave the worker in an unknown state
+RESTART_STATUSES = ("timeout", "cancelled", "crashed")
+
+
+def _failure(status: str, message: str) -> Dict:
+    return {"type": "text", "output": message, "status": status, "stdout": ""}
+
+
+def result_nbytes(result: Dict) -> int:
+    size = len(result.get("png", b"")) + len(result.get("output", ""))
+    if "df" in result:
+        size += frame_nbytes(result["df"])
+    return size
+
+
+# Successful results by (dataset, code, dpi), shared by all sessions
+result_cache = LRUCache(RESULT_CACHE_MB * 1024 ** 2, result_nbytes)
+
+
+def result_key(fingerprint: str, code: str, dpi: int = CHART_DPI) -> str:
+    digest = hashlib.blake2b(code.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{fingerprint}:{digest}:{dpi}"
+
+
+# Helpers the parent process answers for code running in a worker: its
+# caches hold the rollups built in the background and the group indexes
+# the profiler built, the workers' don't
+PARENT_HELPERS = ("rollup", "top_counts", "group_agg")
+
+
+def _helpers() -> Dict:
+    """The functions generated code can call, by name"""
+    from sql_backend import run_sql
+    from plotting import PlotAggregator
+    from time_index import TimeIndex
+    from rollup import RollupCube
+    from groups import GroupIndex
+
+    return {"run_sql": run_sql,
+            "plot_histogram": PlotAggregator.histogram,
+            "plot_scatter": PlotAggregator.scatter,
+            "resample_dates": TimeIndex.resample_frame,
+            "rollup": RollupCube.query,
+            "top_counts": GroupIndex.top_counts,
+            "group_agg": GroupIndex.aggregate}
+
+
+def execute(df: pd.DataFrame, code: str, dpi: int = CHART_DPI,
+            helpers: Optional[Dict] = None) -> Dict:
+    """Run code against `df` and turn what it leaves behind into a result
+
+    PNG bytes if it set result_img_path or drew a figure, otherwise `result`
+    as a table or text, otherwise whatever it printed. `helpers` replace
+    the standard ones of the same name.
+    """
+    import matplotlib.pyplot as plt
+
+    namespace = {"pd": pd, "np": np, "df": df, "plt": plt, **_helpers(), **(helpers or {})}
+    stdout = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(stdout):
+            exec(code, namespace)
+        printed = stdout.getvalue().strip()
+        result = {"status": "ok", "stdout": printed}
+
+        if namespace.get("result_img_path"):
+            with open(namespace["result_img_path"], "rb") as f:
+                return {**result, "type": "image", "png": f.read()}
+
+        if plt.get_fignums():
+            buffer = io.BytesIO()
+            plt.savefig(buffer, format="png", bbox_inches="tight", dpi=dpi)
+            return {**result, "type": "image", "png": buffer.getvalue()}
+
+        if "result" in namespace:
+            res = namespace["result"]
+            if isinstance(res, pd.DataFrame):
+                return {**result, "type": "dataframe", "df": res}
+            return {**result, "type": "text", "output": str(res)}
+
+        if printed:
+            return {**result, "type": "text", "output": printed}
+        return {**result, "type": "text", "output": "Execution finished. No result produced."}
+    except Exception as e:
+        result = _failure("error", f"Execution error: {str(e) or type(e).__name__}")
+        result["stdout"] = stdout.getvalue().strip()
+        return result
+    finally:
+        plt.close("all")
+
+
+def _limit_memory(memory_mb: int, mapped_bytes: int = 0) -> None:
+    """Cap the worker's address space at memory_mb plus the mapped dataset
+
+    A memory-mapped dataset counts towards RLIMIT_AS, so the limit is set
+    again for each dataset. Only the soft limit is lowered, so it can be
+    raised for the next one; it guards against runaway code, it doesn't
+    contain hostile code.
+    """
+    if resource is None or not memory_mb:
+        return
+    limit = memory_mb * 1024 ** 2 + mapped_bytes
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _parent_calls(conn, frame: pd.DataFrame) -> Dict:
+    """Stand-ins for PARENT_HELPERS in a worker
+
+    Calls on `frame` (the dataset the code was given) are sent to the
+    parent process and answered there; calls on any other frame, or with
+    arguments that can't be sent, run in the worker.
+    """
+    local = _helpers()
+    lock = threading.Lock()
+
+    def stand_in(name: str):
+        def call(df, *args, **kwargs):
+            if df is not frame:
+                return local[name](df, *args, **kwargs)
+            with lock:
+                try:
+                    conn.send(("call", name, args, kwargs))
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    return local[name](df, *args, **kwargs)
+                ok, value = conn.recv()
+            if not ok:
+                raise value
+            return value
+        return call
+
+    return {name: stand_in(name) for name in PARENT_HELPERS}
+
+
+def _worker(conn, memory_mb: int) -> None:
+    """Worker loop: keep the last dataset, run each code string against it"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401  (imported once, before any run)
+    import sql_backend  # noqa: F401
+    import plotting  # noqa: F401
+    import time_index  # noqa: F401
+    import rollup  # noqa: F401
+    import groups  # noqa: F401
+
+    _limit_memory(memory_mb)
+    current, df = None, None
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+
+        fingerprint, source, code = message
+        if fingerprint != current:
+            # Release the previous dataset before loading the next one
+            current, df = None, None
+            if isinstance(source, pd.DataFrame):
+                _limit_memory(memory_mb)
+                df = source
+            else:
+                try:
+                    mapped = disk_cache.path_for(source).stat().st_size
+                except OSError:
+                    mapped = 0
+                _limit_memory(memory_mb, mapped)
+                df = disk_cache.get(source)
+            if df is None:
+                conn.send(_failure("missing", "Dataset is no longer in the disk cache"))
+                continue
+            current = fingerprint
+
+        # Shallow copy: column changes made by the code don't leak into the next run
+        run_df = df.copy(deep=False)
+        register_fingerprint(run_df, fingerprint)
+        result = execute(run_df, code, helpers=_parent_calls(conn, run_df))
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send(_failure("error", f"Execution error: result could not be returned ({e})"))
+
+
+class _Worker:
+    def __init__(self, ctx, memory_mb: int):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker, args=(child, memory_mb), daemon=True)
+        self.process.start()
+        child.close()
+        self.dataset = None
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class SandboxPool:
+    """Pre-warmed worker processes that run generated code
+
+    Workers import pandas, NumPy and matplotlib once and keep the last
+    dataset they were sent, so a run pays neither interpreter start-up nor
+    a reload of the data. Datasets reach the workers as memory-mapped Arrow
+    files from the disk cache, or pickled once per worker when they can't
+    be stored there. A run that times out, is cancelled or kills its worker
+    (e.g. by hitting the memory limit) gets that worker replaced. Calls to
+    PARENT_HELPERS on the dataset are answered by this process from its
+    own caches while the worker waits.
+    """
+
+    def __init__(self, workers: int = SANDBOX_WORKERS, memory_mb: int = SANDBOX_MEMORY_MB):
+        methods = mp.get_all_start_methods()
+        if "forkserver" in methods:
+            # Replacement workers fork from a server that already imported pandas
+            self._ctx = mp.get_context("forkserver")
+            self._ctx.set_forkserver_preload(["sandbox"])
+        else:
+            self._ctx = mp.get_context("spawn")
+
+        self.memory_mb = memory_mb
+        self.runs = 0
+        self.restarts = 0
+        self._lock = threading.Lock()  # runs and restarts, updated from many threads
+        self._unshareable = set()
+        self._idle = queue.Queue()
+        self._workers = [_Worker(self._ctx, memory_mb) for _ in range(max(workers, 1))]
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def _source(self, df: pd.DataFrame, fingerprint: str) -> Optional[str]:
+        """Disk cache key the workers can map the dataset from, if any
+
+        Loaded datasets are on disk under their fingerprint already (the
+        loader's cache key); other frames are written there once.
+        """
+        if fingerprint in self._unshareable:
+            return None
+        if disk_cache.path_for(fingerprint).exists() or disk_cache.put(fingerprint, df):
+            return fingerprint
+        self._unshareable.add(fingerprint)
+        return None
+
+    @staticmethod
+    def _answer(worker: _Worker, df: pd.DataFrame, name: str, args: tuple, kwargs: Dict) -> None:
+        """Run a helper call from the worker's code against the dataset here"""
+        try:
+            if name not in PARENT_HELPERS:
+                raise NameError(f"{name}() is not answered by the parent process")
+            reply = (True, _helpers()[name](df, *args, **kwargs))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            worker.conn.send(reply)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            # The result or the exception doesn't pickle
+            worker.conn.send((False, RuntimeError(f"{name}() result could not be returned ({e})")))
+
+    @staticmethod
+    def _wait(worker: _Worker, deadline: float,
+              cancel: Optional[threading.Event], df: pd.DataFrame) -> Dict:
+        while True:
+            if cancel is not None and cancel.is_set():
+                return _failure("cancelled", "Execution cancelled.")
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return _failure("timeout", "Execution error: timed out")
+            try:
+                if worker.conn.poll(min(remaining, 0.1)):
+                    message = worker.conn.recv()
+                    if isinstance(message, tuple) and message[0] == "call":
+                        SandboxPool._answer(worker, df, *message[1:])
+                        continue
+                    return message
+            except (EOFError, OSError):
+                return _failure("crashed", "Execution error: the worker process stopped "
+                                           "(memory limit exceeded?)")
+
+    def run(self, df: pd.DataFrame, code: str, timeout: float = None,
+            cancel: Optional[threading.Event] = None) -> Dict:
+        """Run code in the next free worker; blocks while all are busy"""
+        timeout = SANDBOX_TIMEOUT_S if timeout is None else timeout
+        fingerprint = dataset_fingerprint(df)
+        key = self._source(df, fingerprint)
+
+        worker = self._idle.get()
+        start = time.perf_counter()
+        result = None
+        try:
+            source = None if worker.dataset == fingerprint else (key or df)
+            worker.dataset = None
+            worker.conn.send((fingerprint, source, code))
+            result = self._wait(worker, start + timeout, cancel, df)
+            if result["status"] == "missing":
+                worker.conn.send((fingerprint, df, code))
+                result = self._wait(worker, start + timeout, cancel, df)
+            if result["status"] not in RESTART_STATUSES:
+                worker.dataset = fingerprint
+        except (EOFError, OSError, BrokenPipeError):
+            result = _failure("crashed", "Execution error: the worker process stopped")
+        finally:
+            with self._lock:
+                self.runs += 1
+            if result is None or result["status"] in RESTART_STATUSES:
+                worker = self._replace(worker)
+            self._idle.put(worker)
+
+        if result["status"] == "timeout":
+            result["output"] = f"Execution error: timed out after {timeout:g}s"
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.stop()
+        fresh = _Worker(self._ctx, self.memory_mb)
+        with self._lock:
+            self.restarts += 1
+            self._workers = [fresh if w is worker else w for w in self._workers]
+        return fresh
+
+    def close(self) -> None:
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            worker.stop()
+        self._workers = []
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"workers": len(self._workers), "runs": self.runs, "restarts": self.restarts}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SandboxPool:
+    """The process-wide pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+            atexit.register(_pool.close)
+    return _pool
+
+
+def run(df: pd.DataFrame, code: str, timeout: float = None,
+        cancel: Optional[threading.Event] = None) -> Dict:
+    """Run code in the pool (or in-process with SANDBOX_WORKERS = 0)
+
+    Results come from the result cache when the same code already ran on
+    the same dataset.
+    """
+    key = result_key(dataset_fingerprint(df), code)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return {**cached, "elapsed": 0.0, "cached": True}
+
+    if SANDBOX_WORKERS <= 0:
+        start = time.perf_counter()
+        result = execute(df, code)
+        result["elapsed"] = time.perf_counter() - start
+    else:
+        result = get_pool().run(df, code, timeout=timeout, cancel=cancel)
+
+    if result["status"] == "ok":
+        result_cache.put(key, result)
+    return result
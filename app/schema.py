@@ -0,0 +1,87 @@
+"""Schema Inference Module"""
+import warnings
+from typing import Dict, List
+import pandas as pd
+import numpy as np
+from config import MAX_CATEGORIES, PROFILE_CACHE_ENTRIES, SCHEMA_SAMPLE_SIZE
+from cache import LRUCache, dataset_fingerprint
+from sketches import exceeds_distinct
+
+# Share of parsed values in the sample that settles the datetime question;
+# anything in between is ambiguous and checked against the full column.
+DATETIME_ACCEPT = 0.8
+DATETIME_REJECT = 0.2
+
+
+class SchemaInferer:
+    """Infers numeric / datetime / categorical columns from bounded samples"""
+
+    _cache = LRUCache(PROFILE_CACHE_ENTRIES, lambda schema: 1)
+
+    @staticmethod
+    def _sample(col: pd.Series, size: int) -> pd.Series:
+        """Up to `size` non-null values spread over the whole column"""
+        head = col.iloc[:size * 4].dropna()
+        if len(head) >= size or len(col) <= size * 4:
+            return head.iloc[:size]
+
+        # Sparse head: pick evenly spaced rows from the rest of the column
+        positions = np.linspace(0, len(col) - 1, num=size * 4).astype(np.int64)
+        return pd.concat([head, col.iloc[positions].dropna()]).iloc[:size]
+
+    @staticmethod
+    def _parsed_share(values: pd.Series) -> float:
+        if len(values) == 0:
+            return 0.0
+        with warnings.catch_warnings():
+            # Per-element parsing when no single format is inferred
+            warnings.simplefilter("ignore", UserWarning)
+            parsed = pd.to_datetime(values.astype(str), errors="coerce")
+        return float(parsed.notna().mean())
+
+    @staticmethod
+    def looks_like_datetime(col: pd.Series, sample_size: int = SCHEMA_SAMPLE_SIZE) -> bool:
+        """Parse a sample; escalate to the full column only if it's ambiguous"""
+        share = SchemaInferer._parsed_share(SchemaInferer._sample(col, sample_size))
+        if share >= DATETIME_ACCEPT:
+            return True
+        if share <= DATETIME_REJECT:
+            return False
+        return SchemaInferer._parsed_share(col.dropna()) >= 0.5
+
+    @staticmethod
+    def is_low_cardinality(col: pd.Series, limit: int = MAX_CATEGORIES) -> bool:
+        # Stops at the first block that passes the limit
+        return not exceeds_distinct(col, limit)
+
+    @staticmethod
+    def infer(df: pd.DataFrame) -> Dict[str, List]:
+        """Column kinds for a dataset, cached by its fingerprint"""
+        fingerprint = dataset_fingerprint(df)
+        cached = SchemaInferer._cache.get(fingerprint)
+        if cached is not None:
+            return {kind: list(cols) for kind, cols in cached.items()}
+
+        numeric, datetime, categorical = [], [], []
+        for i, name in enumerate(df.columns):
+            col = df.iloc[:, i]
+            dtype = col.dtype
+
+            if pd.api.types.is_bool_dtype(dtype):
+                pass
+            elif pd.api.types.is_numeric_dtype(dtype):
+                numeric.append(name)
+                continue
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                datetime.append(name)
+                continue
+            elif SchemaInferer.looks_like_datetime(col):
+                datetime.append(name)
+                continue
+
+            if SchemaInferer.is_low_cardinality(col):
+                categorical.append(name)
+
+        schema = {"numeric": numeric, "datetime": datetime, "categorical": categorical}
+        SchemaInferer._cache.put(fingerprint, schema)
+        return {kind: list(cols) for kind, cols in schema.items()}
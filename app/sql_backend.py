@@ -0,0 +1,59 @@
+"""SQL Query Backend Module"""
+import threading
+import pandas as pd
+from config import QUERY_BACKEND
+
+# Optional duckdb import (not required)
+try:
+    import duckdb
+except Exception:
+    duckdb = None
+
+_local = threading.local()
+
+
+def _connection():
+    # DuckDB connections must not be shared between threads
+    con = getattr(_local, "con", None)
+    if con is None:
+        con = _local.con = duckdb.connect()
+    return con
+
+
+def use_duckdb() -> bool:
+    return QUERY_BACKEND == "duckdb" and duckdb is not None
+
+
+def quote(name) -> str:
+    """Quote a column name as a SQL identifier"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def run_sql(df: pd.DataFrame, sql: str, columns=None, parse_dates=()) -> pd.DataFrame:
+    """Run SQL against `df` (registered as table `df`) on DuckDB
+
+    Only `columns` are exposed when given; `parse_dates` columns are parsed
+    with pd.to_datetime(errors='coerce') first, exactly like the pandas
+    templates. Result columns named after source columns get the source
+    dtype back.
+    """
+    if duckdb is None:
+        raise RuntimeError("duckdb is not installed")
+    src = df if columns is None else df[list(columns)]
+    if parse_dates:
+        src = src.assign(**{c: pd.to_datetime(src[c], errors="coerce") for c in parse_dates})
+
+    con = _connection()
+    con.register("df", src)
+    try:
+        res = con.execute(sql).df()
+    finally:
+        con.unregister("df")
+
+    for c in res.columns:
+        if c in src.columns and res[c].dtype != src[c].dtype:
+            try:
+                res[c] = res[c].astype(src[c].dtype)
+            except (TypeError, ValueError):
+                pass
+    return res
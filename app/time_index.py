@@ -0,0 +1,183 @@
+"""Datetime Index Module"""
+from typing import Optional, Tuple
+import pandas as pd
+import numpy as np
+from config import DATE_INDEX_CACHE_MB
+from cache import LRUCache, dataset_fingerprint
+
+# Month/quarter-end resample aliases ('M'/'Q' were renamed to 'ME'/'QE' in pandas 2.2)
+_NEW_ALIASES = tuple(int(x) for x in pd.__version__.split(".")[:2]) >= (2, 2)
+MONTH_END = "ME" if _NEW_ALIASES else "M"
+QUARTER_END = "QE" if _NEW_ALIASES else "Q"
+
+# Resample rules whose bins are calendar periods: rule prefix -> (period prefix, label)
+_PERIODS = {"ME": ("M", "end"), "M": ("M", "end"), "MS": ("M", "start"),
+            "W": ("W", "end"), "QE": ("Q", "end"), "Q": ("Q", "end"),
+            "YE": ("Y", "end"), "A": ("Y", "end"), "Y": ("Y", "end"),
+            "D": ("D", "start"), "h": ("h", "start"), "H": ("h", "start"),
+            "min": ("min", "start"), "T": ("min", "start"), "s": ("s", "start"),
+            "S": ("s", "start")}
+
+
+def _sum_dtype(dtype: np.dtype) -> type:
+    """The accumulator of a sum, like pandas: float64, int64 or uint64"""
+    return {"f": np.float64, "i": np.int64, "u": np.uint64}[dtype.kind]
+
+
+class TimeIndex:
+    """A datetime column parsed once, kept as sorted epochs
+
+    `epochs` holds the valid (non-NaT) timestamps as sorted int64 values
+    in the column's unit, `order` the row position of each one (a stable
+    argsort). Indexes are cached per dataset and column, so resampling at
+    any frequency, or another template on the same column, never parses
+    or copies the frame again. Calendar frequencies are binned with
+    searchsorted over the period edges; anything else goes through pandas
+    on the sorted index.
+    """
+
+    _cache = LRUCache(DATE_INDEX_CACHE_MB * 1024 ** 2, lambda index: index.nbytes)
+
+    def __init__(self, name, epochs: np.ndarray, order: np.ndarray, dtype):
+        self.name = name
+        self.epochs = epochs
+        self.order = order
+        self.dtype = dtype
+        self.unit = dtype.unit if isinstance(dtype, pd.DatetimeTZDtype) else np.datetime_data(dtype)[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.epochs.nbytes + self.order.nbytes
+
+    @staticmethod
+    def get(df: pd.DataFrame, name) -> "TimeIndex":
+        """The index of df[name], parsed with to_datetime(errors='coerce')"""
+        key = f"{dataset_fingerprint(df)}:{name!r}"
+        index = TimeIndex._cache.get(key)
+        if index is not None:
+            return index
+
+        col = df[name]
+        parsed = col if pd.api.types.is_datetime64_any_dtype(col.dtype) \
+            else pd.to_datetime(col, errors="coerce")
+        if not pd.api.types.is_datetime64_any_dtype(parsed.dtype):
+            # e.g. mixed time zones; resample can't bin these either
+            raise TypeError(f"Column {name!r} does not parse to a single datetime type")
+
+        if isinstance(parsed.dtype, pd.DatetimeTZDtype):
+            values = parsed.array.asi8.view(f"M8[{parsed.dtype.unit}]")
+        else:
+            values = parsed.to_numpy()
+        epochs = values.view(np.int64)
+        valid = np.flatnonzero(~np.isnat(values))
+        order = valid[np.argsort(epochs[valid], kind="stable")]
+
+        index = TimeIndex(name, epochs[order], order, parsed.dtype)
+        TimeIndex._cache.put(key, index)
+        return index
+
+    def index(self) -> pd.DatetimeIndex:
+        """The sorted timestamps as a DatetimeIndex of the column's dtype"""
+        index = pd.DatetimeIndex(self.epochs.view(f"M8[{self.unit}]"), name=self.name)
+        if isinstance(self.dtype, pd.DatetimeTZDtype):
+            index = index.tz_localize("UTC").tz_convert(self.dtype.tz)
+        return index
+
+    def _bins(self, freq: str) -> Optional[Tuple[np.ndarray, pd.DatetimeIndex]]:
+        """(edges, labels) of the resample bins, or None if pandas must do it"""
+        if isinstance(self.dtype, pd.DatetimeTZDtype) or len(self.epochs) == 0:
+            return None
+        offset = pd.tseries.frequencies.to_offset(freq)
+        prefix, _, suffix = offset.rule_code.partition("-")
+        if offset.n != 1 or prefix not in _PERIODS:
+            return None
+        period, label = _PERIODS[prefix]
+        period = f"{period}-{suffix}" if suffix else period
+
+        first, last = (pd.Timestamp(v) for v in self.epochs[[0, -1]].view(f"M8[{self.unit}]"))
+        periods = pd.period_range(first, last, freq=period)
+        edges = np.append(periods.start_time.as_unit(self.unit).asi8,
+                          (periods[-1:] + 1).start_time.as_unit(self.unit).asi8)
+        labels = periods.end_time.normalize() if label == "end" else periods.start_time
+        return edges, pd.DatetimeIndex(labels.as_unit(self.unit), name=self.name)
+
+    def resample(self, freq: str, values: np.ndarray = None) -> pd.Series:
+        """Row count per bin, or the sum of `values` (one per row) per bin
+
+        Same bins, labels and empty-bin handling as
+        Series.resample(freq).size() / .sum() on the parsed column.
+        """
+        gathered = None if values is None else values[self.order]
+        bins = self._bins(freq)
+        summable = gathered is None or (isinstance(gathered.dtype, np.dtype)
+                                        and gathered.dtype.kind in "iuf")
+        if bins is None or not summable:
+            series = pd.Series(np.zeros(len(self.order), dtype=np.int64) if gathered is None
+                               else gathered, index=self.index())
+            grouped = series.resample(freq)
+            return grouped.size() if gathered is None else grouped.sum()
+
+        edges, labels = bins
+        bounds = np.searchsorted(self.epochs, edges, side="left")
+        counts = np.diff(bounds)
+        if gathered is None:
+            return pd.Series(counts, index=labels)
+
+        if gathered.dtype.kind == "f":
+            np.nan_to_num(gathered, copy=False, nan=0.0)
+        # Integers sum in int64 / uint64 so narrow columns don't wrap
+        total = _sum_dtype(gathered.dtype)
+        sums = np.zeros(len(counts), dtype=total)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(gathered, bounds[:-1][filled], dtype=total)
+        if gathered.dtype.kind == "f":
+            sums = sums.astype(gathered.dtype, copy=False)
+        return pd.Series(sums, index=labels)
+
+    def aggregate(self, freq: str, values: np.ndarray) -> pd.DataFrame:
+        """count / sum / min / max of `values` (one per row) per bin
+
+        Missing values are skipped; empty bins have a count and sum of 0
+        and no min or max, as with Series.resample(freq).agg(...).
+        """
+        gathered = values[self.order]
+        bins = self._bins(freq)
+        if bins is None or not (isinstance(gathered.dtype, np.dtype) and gathered.dtype.kind in "iuf"):
+            series = pd.Series(gathered, index=self.index())
+            return series.resample(freq).agg(["count", "sum", "min", "max"])
+
+        edges, labels = bins
+        bounds = np.searchsorted(self.epochs, edges, side="left")
+        filled = np.diff(bounds) > 0  # never empty: the first and last bins hold data
+        starts = bounds[:-1][filled]
+        total = _sum_dtype(gathered.dtype)
+
+        if gathered.dtype.kind == "f":
+            counts = np.add.reduceat((~np.isnan(gathered)).astype(np.int64), starts)
+            lo, hi = np.fmin.reduceat(gathered, starts), np.fmax.reduceat(gathered, starts)
+            np.nan_to_num(gathered, copy=False, nan=0.0)
+        else:
+            counts = np.diff(bounds)[filled]
+            lo, hi = np.minimum.reduceat(gathered, starts), np.maximum.reduceat(gathered, starts)
+
+        table = pd.DataFrame({"count": np.zeros(len(labels), dtype=np.int64),
+                              "sum": np.zeros(len(labels), dtype=total),
+                              "min": np.nan, "max": np.nan}, index=labels)
+        table.loc[filled, "count"] = counts
+        table.loc[filled, "sum"] = np.add.reduceat(gathered, starts, dtype=total)
+        table.loc[filled, "min"] = lo
+        table.loc[filled, "max"] = hi
+        return table
+
+    @staticmethod
+    def resample_frame(df: pd.DataFrame, name, freq: str, value=None) -> pd.DataFrame:
+        """resample(freq) of df[value].sum(), or .size() as 'count', by df[name]
+
+        The table the monthly templates show: the bin label column, then
+        the sum or count, one row per bin from the first to the last date.
+        """
+        index = TimeIndex.get(df, name)
+        if value is None:
+            return index.resample(freq).reset_index(name="count")
+        series = index.resample(freq, df[value].to_numpy())
+        return series.rename(value).reset_index()
@@ -0,0 +1,34 @@
+"""TimeIndex resampling checks against pandas"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from time_index import MONTH_END, TimeIndex  # noqa: E402
+
+
+def _frame(dtype) -> pd.DataFrame:
+    dates = pd.date_range("2024-01-01", periods=2400, freq="h")
+    return pd.DataFrame({"date": dates, "value": np.full(len(dates), 100, dtype=dtype)})
+
+
+def test_int8_sums_do_not_wrap():
+    for dtype in (np.int8, np.uint8):
+        df = _frame(dtype)
+        expected = df.set_index("date")["value"].resample(MONTH_END).sum()
+        result = TimeIndex.get(df, "date").resample(MONTH_END, df["value"].to_numpy())
+        pd.testing.assert_series_equal(result, expected, check_names=False, check_freq=False)
+
+
+def test_int8_aggregate_matches_pandas():
+    df = _frame(np.int8)
+    expected = df.set_index("date")["value"].resample(MONTH_END).agg(["count", "sum", "min", "max"])
+    table = TimeIndex.get(df, "date").aggregate(MONTH_END, df["value"].to_numpy())
+    assert table["sum"].tolist() == expected["sum"].tolist()
+    assert table["sum"].dtype == np.int64
+    assert table["count"].tolist() == expected["count"].tolist()
+    assert table["min"].tolist() == expected["min"].tolist()
+    assert table["max"].tolist() == expected["max"].tolist()